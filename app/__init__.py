@@ -2,4 +2,15 @@ from .app import App
 from .app import AppModule
 
 from .bot import BaseBot
-from .bot import PrettyType
\ No newline at end of file
+from .bot import PrettyType
+from .bot import AutoShardedBaseBot
+
+from .ipc import Bus
+from .ipc import ProcessBus
+
+from .jobs import Job
+from .jobs import JobState
+from .jobs import JobManager
+
+from .launcher import Launcher
+from .launcher import launch
\ No newline at end of file
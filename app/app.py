@@ -1,12 +1,19 @@
+import sys
 import json
+import time
+import asyncio
+import hashlib
+import importlib
 
 from typing import Union
 
 import discord
 from discord.ext import commands
 
-from utils import Log, LogLevel
-from .bot import BaseBot, PrettyType
+from utils import Log, LogLevel, BotInternalException, HttpClient, logger, http, pools, metrics, current_command, watchdog
+from .bot import BaseBot, AutoShardedBaseBot, PrettyType
+from .ipc import Bus
+from .jobs import JobManager
 from db import Database
 
 class AppModule(Log):
@@ -41,9 +48,28 @@ class AppModule(Log):
     @property
     def settings(self) -> dict:
         return self.app.settings
+
+    @property
+    def http(self) -> HttpClient:
+        return self.app.http
+
+    def exportState(self) -> dict:
+        """State handed to the replacement instance when the module is reloaded."""
+        return {}
+
+    def importState(self, state: dict):
+        pass
+
+    def unload(self):
+        """Called on the old instance after a reload replaced it."""
+        pass
     
 class App(Log):
-    def __init__(self):
+    def __init__(self, node: int = 0, shard_ids: list = None, shard_count: int = None, bus: Bus = None):
+        self.startup_timings    = {}
+        self._started           = time.perf_counter()
+        phase                   = self._started
+
         try:
             with open("settings.json", 'r') as file:
                 self.settings = json.load(file)
@@ -60,23 +86,77 @@ class App(Log):
 
             self._check_required_settings()
 
+            if "log" in self.settings:
+                logger.configure(**self.settings["log"])
+
+            if "pools" in self.settings:
+                pools.configure(self.settings["pools"])
+
+            if "http" in self.settings:
+                http.configure(**self.settings["http"])
+
         except FileNotFoundError:
             self.log("Can't find settings.json", LogLevel.FATAL)
             exit(1)
-        except RuntimeError as e:
+        except (RuntimeError, KeyError, TypeError) as e:
             self.log(str(e), LogLevel.FATAL)
             exit(1)
 
-        self.db = Database(self.settings["db_ip"],
-                           self.settings["db_port"], 
-                           self.settings["db_user"], 
-                           self.settings["db_pass"], 
-                           self.settings["db_db"])
+        phase = self._phase("settings", phase)
+
+        # Connecting and create_all run in the background while the bot and modules are built
+        self._db = pools.get("io").submit(self._connectDatabase)
+
+        self.node               = node
+        self.bus    : Bus       = bus if bus else Bus(node)
 
-        self.bot    : BaseBot   = BaseBot('**', self.settings)
-        self.bot.add_listener(self.on_ready)
+        if shard_ids is not None or self.settings.get("shard_mode") == "auto":
+            self.bot : BaseBot  = AutoShardedBaseBot('**', self.settings, shard_ids=shard_ids, shard_count=shard_count)
+        else:
+            self.bot : BaseBot  = BaseBot('**', self.settings)
+
+        self.http   : HttpClient = http
+        self.jobs               = JobManager(self, self.settings.get("jobs_per_guild", 1))
+
+        self.bot.setup_callbacks.append(self.setup)
+        self.bot.close_callbacks.append(http.close)
+        self.bot.close_callbacks.append(metrics.stop_server)
+        self.bot.before_invoke(self._before_invoke)
+        self.bot.after_invoke(self._after_invoke)
+        self.bot.add_listener(self._logStartup, "on_ready")
+        self.bus.subscribe("module_reload", self._onModuleReload)
         self.modules = {}
 
+        self._phase("bot", phase)
+
+    def _phase(self, name: str, start: float):
+        now = time.perf_counter()
+        self.startup_timings[name] = now - start
+        return now
+
+    def _connectDatabase(self) -> Database:
+        start = time.perf_counter()
+        db = Database(self.settings["db_ip"],
+                      self.settings["db_port"], 
+                      self.settings["db_user"], 
+                      self.settings["db_pass"], 
+                      self.settings["db_db"])
+        self._phase("database (background)", start)
+        return db
+
+    @property
+    def db(self) -> Database:
+        # Blocks only if something needs the database before the background connect finished
+        return self._db.result()
+
+    async def _logStartup(self):
+        if "ready" in self.startup_timings:
+            return
+
+        self._phase("ready", self._started)
+        breakdown = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.startup_timings.items())
+        self.log(f"Startup: {breakdown}")
+
     def _check_settings_exist(self, p):
         if not (p in self.settings):
             raise RuntimeError(f"Missing setting {p} in settings.json")
@@ -87,21 +167,136 @@ class App(Log):
             
     def addModule(self, c):
         try:
+            start = time.perf_counter()
             inst = c(self)
+            self._phase(f"module {inst.name}", start)
             self.log(f"Adding module {inst.name} to app")
             self.modules[inst.name] = inst
         except RuntimeError as e:
             self.log(str(e), LogLevel.FATAL)
             exit(1)
 
-    async def on_ready(self):
-        for name, inst in self.modules.items():
+    async def reloadModule(self, name: str, broadcast: bool = True):
+        """Re-imports the module's source and swaps in a new instance, the gateway session stays up."""
+        if name not in self.modules:
+            raise BotInternalException(f"Unknown module {name}")
+
+        start = time.perf_counter()
+        old = self.modules[name]
+        # Constructors register job handlers, a failed reload must leave the old ones in place
+        handlers = dict(self.jobs.handlers)
+
+        try:
+            module = importlib.reload(sys.modules[old.__class__.__module__])
+            inst = getattr(module, old.__class__.__name__)(self)
+        except Exception as e:
+            # Nothing was swapped yet, the old instance keeps running
+            self.jobs.handlers = handlers
+            raise BotInternalException(f"Failed to reload {name}: {e}")
+
+        if isinstance(old, commands.Cog):
+            await self.bot.remove_cog(old.qualified_name)
+
+        inst.importState(old.exportState())
+
+        try:
             if isinstance(inst, commands.Cog):
-                self.log(f"Adding Cog {name} to bot")
                 await self.bot.add_cog(inst)
+        except Exception as e:
+            # The new instance never went live, undo its hooks and put the old one back with the state it handed over
+            inst.unload()
+            old.importState(inst.exportState())
+            self.jobs.handlers = handlers
+
+            if isinstance(old, commands.Cog):
+                await self.bot.add_cog(old)
+
+            raise BotInternalException(f"Failed to reload {name}: {e}")
+
+        old.unload()
+        self.modules[name] = inst
+
+        if self.node == 0:
+            await self.syncCommands()
+
+        if broadcast:
+            self.bus.publish("module_reload", name=name)
+
+        elapsed = time.perf_counter() - start
+        self.log(f"Reloaded module {name} in {elapsed * 1000:.0f}ms")
+        return elapsed
+
+    def _onModuleReload(self, name: str):
+        self.bot.run_async(self.reloadModule(name, broadcast=False))
+
+    async def _before_invoke(self, ctx: commands.Context):
+        ctx._invoke_start = time.perf_counter()
+        current_command.set(ctx.command.qualified_name)
+        metrics.inc("bot_commands_total", command=ctx.command.qualified_name)
+
+    async def _after_invoke(self, ctx: commands.Context):
+        start = getattr(ctx, "_invoke_start", None)
+        if start is not None:
+            metrics.observe("bot_stage_seconds", time.perf_counter() - start, command=ctx.command.qualified_name, stage="total")
+
+    def _commandsHash(self):
+        tree = self.bot.tree
+
+        try:
+            payload = [command.to_dict(tree) for command in tree.get_commands()]
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            payload = [command.to_dict() for command in tree.get_commands()]
+
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def syncCommands(self, force: bool = False):
+        """Syncs the global command tree if it changed since the last sync, returns the synced commands or None."""
+        cache = self.bot.cache
+        digest = self._commandsHash()
+
+        if not force and "commands_hash" in cache and cache.commands_hash == digest:
+            self.log("Command tree unchanged, skipping sync")
+            return None
 
         synced = await self.bot.tree.sync()
+        cache.commands_hash = digest
         self.log(f"Synced {len(synced)} global commands")
+        return synced
+
+    async def setup(self):
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wrap_future(self._db)
+        except Exception as e:
+            self.log(f"Can't connect to database: {e}", LogLevel.FATAL)
+            raise
+
+        start = self._phase("database wait", start)
+
+        # Runs once from setup_hook, before the gateway connects, not on every on_ready
+        for name, inst in self.modules.items():
+            if isinstance(inst, commands.Cog):
+                self.log(f"Adding Cog {name} to bot")
+                await self.bot.add_cog(inst)
+
+        self.bus.start(self.bot.loop)
+
+        # Global commands are shared by all shards, one node is enough to sync them
+        if self.node == 0:
+            await self.syncCommands()
+
+        await self.jobs.resume()
+
+        self._phase("setup", start)
+
+        if self.settings.get("watchdog_threshold", 0.25):
+            watchdog.threshold = self.settings.get("watchdog_threshold", 0.25)
+            watchdog.start()
+
+        if "metrics_port" in self.settings:
+            await metrics.start_server(self.settings.get("metrics_host", "127.0.0.1"), self.settings["metrics_port"] + self.node)
         
     def run(self):
         self.bot.run(self.settings["token"])
\ No newline at end of file
@@ -9,10 +9,12 @@ from functools import wraps
 import discord
 from discord.ext import commands, tasks
 
-from utils import Log, LogLevel, Cache, BotInternalException, get_file_extension
+from utils import Log, LogLevel, Cache, LRUCache, BotInternalException, get_file_extension, metrics
 
 from enum import Enum, auto
 
+_MISSING = object()
+
 class PrettyType(Enum):
     SUCCESS     = auto()
     ERROR       = auto()
@@ -20,20 +22,76 @@ class PrettyType(Enum):
     INFO        = auto()
 
 class BaseBot(commands.Bot, Log):
-    def __init__(self, command_prefix: str, settings):
+    def __init__(self, command_prefix: str, settings, **kwargs):
         intents                         = discord.Intents.default()
         intents.guild_messages          = True
         intents.dm_messages             = True
         intents.members                 = True
         intents.message_content         = True
+
+        # "lean" keeps only voice members in discord.py's cache and skips chunking,
+        # everything else goes through getMember and a small LRU
+        self.member_cache_mode          = settings.get("member_cache", "full")
+        if self.member_cache_mode == "lean":
+            member_cache_flags          = discord.MemberCacheFlags.none()
+            member_cache_flags.voice    = True
+            kwargs.setdefault("member_cache_flags", member_cache_flags)
+            kwargs.setdefault("chunk_guilds_at_startup", False)
         
-        super().__init__(command_prefix, intents=intents)
+        super().__init__(command_prefix, intents=intents, **kwargs)
+
+        self.members                    = LRUCache(settings.get("member_lru_size", 1024))
+        self.member_miss_ttl            = settings.get("member_miss_ttl", 60)
 
         self.__cache                    = Cache()
         self.__cache.load()
+
+        self.setup_callbacks            = []
+        self.close_callbacks            = []
+
+        self.message_stats              = {
+            "filtered":     0,
+            "dispatched":   0
+        }
                 
-    def getMessageString(self, ctx: commands.Context):
-        message = ctx.message
+    @property
+    def cache(self) -> Cache:
+        return self.__cache
+
+    async def setup_hook(self):
+        for callback in self.setup_callbacks:
+            await callback()
+
+    async def close(self):
+        for callback in self.close_callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                self.log(f"Close callback failed: {e}", LogLevel.ERR)
+
+        await super().close()
+
+    async def getMember(self, guild: discord.Guild, uid: int):
+        """Resolves a member from discord.py's cache, then the LRU of recently seen members, then the API."""
+        member = guild.get_member(uid)
+        if member:
+            return member
+
+        key = (guild.id, uid)
+        member = self.members.get(key, _MISSING)
+        if member is not _MISSING:
+            return member
+
+        try:
+            member = await guild.fetch_member(uid)
+        except (discord.NotFound, discord.Forbidden):
+            member = None
+
+        # Misses are cached too so unknown ids are not refetched every time, but only briefly so later joins resolve
+        self.members.put(key, member, ttl=None if member else self.member_miss_ttl)
+        return member
+
+    def getMessageString(self, message: discord.Message):
         _server = message.guild.name if message.guild else 'DM'
         _ch = 'DM' if _server == 'DM' else message.channel
         _msg = message.content if message.content else 'empty'
@@ -56,7 +114,7 @@ class BaseBot(commands.Bot, Log):
         return self.loop.create_task(func)
 
     @staticmethod
-    async def send_pretty(entry: Union[discord.TextChannel, discord.VoiceChannel, discord.Interaction, commands.Context], type: PrettyType, title: str = None, message: str = None, fields: dict = None, view: discord.ui.View = None, delete_after=None, ephemeral=True):       
+    def pretty_embed(type: PrettyType, title: str = None, message: str = None, fields: dict = None, footer: str = None) -> discord.Embed:
         color = discord.Color.light_gray()
         
         if type == PrettyType.SUCCESS:
@@ -70,56 +128,71 @@ class BaseBot(commands.Bot, Log):
         
         embed = discord.Embed(title=title, description=message, color=color, timestamp=discord.utils.utcnow())
         
-        embed.set_footer(text=type.name)   
+        embed.set_footer(text=f"{type.name} | {footer}" if footer else type.name)
 
         if fields:
             for key, value in fields.items():
                 embed.add_field(name=key, value=value)
+
+        return embed
+
+    @staticmethod
+    async def send_pretty(entry: Union[discord.TextChannel, discord.VoiceChannel, discord.Interaction, commands.Context], type: PrettyType, title: str = None, message: str = None, fields: dict = None, view: discord.ui.View = None, delete_after=None, ephemeral=True):       
+        embed = BaseBot.pretty_embed(type, title, message, fields)
             
-        try:
-            if isinstance(entry, discord.Interaction):
-                view = view if view else discord.interactions.MISSING
-                return await entry.response.send_message(embed=embed, view=view, ephemeral=ephemeral)
-            elif isinstance(entry, discord.TextChannel) or isinstance(entry, discord.VoiceChannel):
-                return await entry.send(embed=embed, view=view, delete_after=delete_after)
-            elif isinstance(entry, commands.Context):
-                if (entry.prefix == '/'):
-                    return await entry.send(embed=embed, view=view, ephemeral=ephemeral)
+        with metrics.timed("reply"):
+            try:
+                if isinstance(entry, discord.Interaction):
+                    view = view if view else discord.interactions.MISSING
+                    return await entry.response.send_message(embed=embed, view=view, ephemeral=ephemeral)
+                elif isinstance(entry, discord.TextChannel) or isinstance(entry, discord.VoiceChannel):
+                    return await entry.send(embed=embed, view=view, delete_after=delete_after)
+                elif isinstance(entry, commands.Context):
+                    if (entry.prefix == '/'):
+                        return await entry.send(embed=embed, view=view, ephemeral=ephemeral)
                 
-                return await entry.send(embed=embed, view=view, delete_after=delete_after)
+                    return await entry.send(embed=embed, view=view, delete_after=delete_after)
         
-        except Exception as e:
-            raise BotInternalException(str(e))
+            except Exception as e:
+                raise BotInternalException(str(e))
     
     @staticmethod
     async def send(entry: Union[discord.TextChannel, commands.Context], message: str, delete_after=None, ephemeral=True):
-        try:
-            if isinstance(entry, discord.TextChannel) or isinstance(entry, discord.VoiceChannel):
-                return await entry.send(message, delete_after=delete_after)
-            elif isinstance(entry, commands.Context):
-                if (entry.prefix == '/'):
-                    return await entry.send(message, ephemeral=ephemeral)
+        with metrics.timed("reply"):
+            try:
+                if isinstance(entry, discord.TextChannel) or isinstance(entry, discord.VoiceChannel):
+                    return await entry.send(message, delete_after=delete_after)
+                elif isinstance(entry, commands.Context):
+                    if (entry.prefix == '/'):
+                        return await entry.send(message, ephemeral=ephemeral)
                 
-                return await entry.send(message, delete_after=delete_after)
+                    return await entry.send(message, delete_after=delete_after)
 
-        except Exception as e:
-            raise BotInternalException(str(e))
+            except Exception as e:
+                raise BotInternalException(str(e))
 
     @staticmethod
     async def edit(msg: discord.Message, message: str, delete_after=None):
-        try:
-            await msg.edit(content=message)
+        with metrics.timed("reply"):
+            try:
+                await msg.edit(content=message)
             
-            if delete_after and not msg.flags.ephemeral:
-                await msg.delete(delay=delete_after)
-        except Exception as e:
-            raise BotInternalException(str(e))
+                if delete_after and not msg.flags.ephemeral:
+                    await msg.delete(delay=delete_after)
+            except Exception as e:
+                raise BotInternalException(str(e))
 
     # [BOT] Events
     async def on_ready(self):
         self.log(f"[AUTH] ({self.user.id}) <{self.user.name}> logged in")
 
     async def on_command_error(self, ctx: commands.Context, error):
+        original = error
+        while hasattr(original, "original"):
+            original = original.original
+
+        metrics.inc("bot_command_errors_total", command=ctx.command.qualified_name if ctx.command else "none", error=type(original).__name__)
+
         if isinstance(error, commands.CommandNotFound) or isinstance(error, commands.MissingRequiredArgument):
             await BaseBot.send_pretty(ctx, PrettyType.ERROR, "Error", str(error))
             return
@@ -138,16 +211,27 @@ class BaseBot(commands.Bot, Log):
         raise error
 
     async def on_message(self, message: discord.Message):
-        if message.author == self.user:
+        if message.author == self.user or message.author.bot:
             return
 
-        ctx = await self.get_context(message)
-        if not len(message.content):
+        # Cheap pre-filter on raw content, most messages never need a context
+        content = message.content
+        if not content or not content.startswith(self.command_prefix):
+            self.message_stats["filtered"] += 1
             return
-        
+
+        ctx = await self.get_context(message)
         if ctx.prefix != self.command_prefix:
+            self.message_stats["filtered"] += 1
             return
-        
-        _msg = self.getMessageString(ctx)
-        self.log(_msg)
-        await self.process_commands(message)
\ No newline at end of file
+
+        self.message_stats["dispatched"] += 1
+        if isinstance(message.author, discord.Member):
+            self.members.put((message.guild.id, message.author.id), message.author)
+
+        self.log(lambda: self.getMessageString(message), ratelimit="commands")
+        await self.invoke(ctx)
+
+class AutoShardedBaseBot(BaseBot, commands.AutoShardedBot):
+    """BaseBot running several gateway shards in one process, optionally limited to shard_ids."""
+    pass
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from utils import Log, LogLevel
+
+class Bus(Log):
+    """In-process event bus, publishing reaches nobody else. Base for ProcessBus."""
+
+    def __init__(self, node: int = 0):
+        self.node       = node
+        self._handlers  = {}
+
+    def subscribe(self, topic: str, handler):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def unsubscribe(self, topic: str, handler):
+        if handler in self._handlers.get(topic, []):
+            self._handlers[topic].remove(handler)
+
+    def publish(self, topic: str, **payload):
+        pass
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        pass
+
+    def _dispatch(self, topic: str, payload: dict):
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(**payload)
+            except Exception as e:
+                self.log(f"Handler for {topic} failed: {e}", LogLevel.ERR)
+
+class ProcessBus(Bus):
+    """Bus between shard processes, messages are relayed to every other node by the Launcher."""
+
+    def __init__(self, node: int, send, recv):
+        super(ProcessBus, self).__init__(node)
+        self._send      = send
+        self._recv      = recv
+        self._thread    = None
+
+    def publish(self, topic: str, **payload):
+        self._send.put((self.node, topic, payload))
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if self._thread:
+            return
+
+        self._thread = threading.Thread(target=self._reader, args=(loop,), name="ipc-bus", daemon=True)
+        self._thread.start()
+
+    def _reader(self, loop: asyncio.AbstractEventLoop):
+        while True:
+            try:
+                node, topic, payload = self._recv.get()
+            except (EOFError, OSError):
+                return
+
+            loop.call_soon_threadsafe(self._dispatch, topic, payload)
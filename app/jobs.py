@@ -0,0 +1,145 @@
+import json
+import asyncio
+
+from enum import Enum
+
+from utils import Log, LogLevel, to_thread
+from db import BotJob
+
+class JobState(Enum):
+    PENDING     = "pending"
+    RUNNING     = "running"
+    DONE        = "done"
+    FAILED      = "failed"
+    CANCELLED   = "cancelled"
+
+class Job:
+    def __init__(self, manager, id: int, kind: str, guild_id: int, params: dict, checkpoint: dict = None, progress: str = ""):
+        self.manager    = manager
+        self.id         = id
+        self.kind       = kind
+        self.guild_id   = guild_id
+        self.params     = params
+        self.checkpoint = checkpoint
+        self.progress   = progress
+        self.state      = JobState.PENDING
+
+        self.task       = None
+        self.cancelled  = False
+
+    async def update(self, checkpoint: dict = None, progress: str = None):
+        """Persists a checkpoint so an interrupted job resumes from here instead of starting over."""
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        if progress is not None:
+            self.progress = progress
+
+        await self.manager._save(self)
+
+class JobManager(Log):
+    """Runs long module operations as background jobs with per-guild limits, cancellation and resumable checkpoints."""
+
+    def __init__(self, app, per_guild: int = 1):
+        self.app        = app
+        self.per_guild  = per_guild
+        self.handlers   = {}
+        self.jobs       = {}
+        self._limits    = {}
+
+    def register(self, kind: str, handler):
+        """handler is an async callable taking the Job, it must be registered before App.setup to resume jobs."""
+        self.handlers[kind] = handler
+
+    def _limit(self, guild_id):
+        if guild_id not in self._limits:
+            self._limits[guild_id] = asyncio.Semaphore(self.per_guild)
+        return self._limits[guild_id]
+
+    @to_thread("db")
+    def _insert(self, kind: str, guild_id, params: dict):
+        with self.app.db.session as session:
+            row = BotJob(node=self.app.node, guild_id=str(guild_id) if guild_id else None, kind=kind, state=JobState.PENDING.value, params=json.dumps(params))
+            session.add(row)
+            session.commit()
+            return row.id
+
+    @to_thread("db")
+    def _save(self, job: Job):
+        with self.app.db.session as session:
+            row = session.query(BotJob).filter_by(id=job.id).first()
+            if row:
+                row.state = job.state.value
+                row.checkpoint = json.dumps(job.checkpoint) if job.checkpoint is not None else None
+                row.progress = job.progress[:255] if job.progress else None
+                session.commit()
+
+    @to_thread("db")
+    def _unfinished(self):
+        with self.app.db.session as session:
+            rows = session.query(BotJob).filter(BotJob.node == self.app.node, BotJob.state.in_([JobState.PENDING.value, JobState.RUNNING.value])).all()
+            return [row.to_dict() for row in rows]
+
+    async def submit(self, kind: str, guild_id, **params) -> Job:
+        if kind not in self.handlers:
+            raise RuntimeError(f"No handler registered for job {kind}")
+
+        id = await self._insert(kind, guild_id, params)
+        job = Job(self, id, kind, guild_id, params)
+        self._start(job)
+        return job
+
+    def _start(self, job: Job):
+        self.jobs[job.id] = job
+        job.task = self.app.bot.run_async(self._run(job))
+
+    async def _run(self, job: Job):
+        try:
+            await self.app.bot.wait_until_ready()
+
+            async with self._limit(job.guild_id):
+                job.state = JobState.RUNNING
+                await self._save(job)
+                self.log(f"Job {job.id} ({job.kind}) started")
+
+                await self.handlers[job.kind](job)
+                job.state = JobState.DONE
+        except asyncio.CancelledError:
+            # Shutdown cancels too, those jobs stay RUNNING in the database and resume on next start
+            if not job.cancelled:
+                raise
+
+            job.state = JobState.CANCELLED
+        except Exception as e:
+            self.log(f"Job {job.id} ({job.kind}) failed: {e}", LogLevel.ERR)
+            job.state = JobState.FAILED
+            job.progress = str(e)
+        finally:
+            self.jobs.pop(job.id, None)
+
+        await self._save(job)
+        self.log(f"Job {job.id} ({job.kind}) {job.state.value}")
+
+    def cancel(self, id: int) -> bool:
+        job = self.jobs.get(id)
+        if not job:
+            return False
+
+        job.cancelled = True
+        job.task.cancel()
+        return True
+
+    def list(self, guild_id=None):
+        return [job for job in self.jobs.values() if guild_id is None or job.guild_id == guild_id]
+
+    async def resume(self):
+        for row in await self._unfinished():
+            if row["kind"] not in self.handlers:
+                self.log(f"Can't resume job {row['id']}, no handler for {row['kind']}", LogLevel.WARN)
+                continue
+
+            guild_id = int(row["guild_id"]) if row["guild_id"] else None
+            checkpoint = json.loads(row["checkpoint"]) if row["checkpoint"] else None
+            job = Job(self, row["id"], row["kind"], guild_id, json.loads(row["params"]), checkpoint, row["progress"] or "")
+
+            self.log(f"Resuming job {job.id} ({job.kind})")
+            self._start(job)
@@ -0,0 +1,78 @@
+import os
+import json
+import threading
+import multiprocessing
+
+from utils import Log, LogLevel
+from .ipc import ProcessBus
+
+def _run_node(setup, node: int, shard_ids: list, shard_count: int, send, recv):
+    from .app import App
+
+    _app = App(node=node, shard_ids=shard_ids, shard_count=shard_count, bus=ProcessBus(node, send, recv))
+    setup(_app)
+    _app.run()
+
+class Launcher(Log):
+    """Runs the bot as N processes, each owning a slice of the shards and its own App and module set."""
+
+    def __init__(self, setup, processes: int = None, shard_count: int = None):
+        self.setup          = setup
+        self.processes      = processes or os.cpu_count() or 1
+        self.shard_count    = shard_count or self.processes
+
+        self._context       = multiprocessing.get_context("spawn")
+        self._hub           = self._context.Queue()
+        self._queues        = [self._context.Queue() for _ in range(self.processes)]
+        self._nodes         = []
+
+    def _relay(self):
+        while True:
+            message = self._hub.get()
+            if message is None:
+                return
+
+            sender = message[0]
+            for node, q in enumerate(self._queues):
+                if node != sender:
+                    q.put(message)
+
+    def run(self):
+        threading.Thread(target=self._relay, name="ipc-relay", daemon=True).start()
+
+        for node in range(self.processes):
+            shard_ids = list(range(node, self.shard_count, self.processes))
+            process = self._context.Process(target=_run_node, name=f"shard-node-{node}", args=(self.setup, node, shard_ids, self.shard_count, self._hub, self._queues[node]))
+            process.start()
+
+            self.log(f"Started node {node} (pid {process.pid}) with shards {shard_ids}")
+            self._nodes.append(process)
+
+        try:
+            for process in self._nodes:
+                process.join()
+                if process.exitcode:
+                    self.log(f"Node {process.name} exited with code {process.exitcode}", LogLevel.ERR)
+        except KeyboardInterrupt:
+            for process in self._nodes:
+                process.terminate()
+        finally:
+            self._hub.put(None)
+
+def launch(setup):
+    """Entry point, picks single, auto-sharded or multi-process mode from settings.json."""
+    try:
+        with open("settings.json", 'r') as file:
+            settings = json.load(file)
+    except (FileNotFoundError, ValueError):
+        # Let App report the problem
+        settings = {}
+
+    if settings.get("shard_mode") == "process":
+        Launcher(setup, settings.get("shard_processes"), settings.get("shard_count")).run()
+    else:
+        from .app import App
+
+        _app = App()
+        setup(_app)
+        _app.run()
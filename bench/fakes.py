@@ -0,0 +1,193 @@
+import time
+import threading
+
+import discord
+
+from sqlalchemy.pool import StaticPool
+
+from app import Bus
+from db import Database, BotUser
+
+class FakeRole(discord.Role):
+    # Plain class attributes shadow discord.py's slots and properties so instances can hold their own values
+    id = name = guild = mention = None
+
+    def __init__(self, id: int, guild=None, name: str = None):
+        self.id         = id
+        self.name       = name or f"role-{id}"
+        self.guild      = guild
+        self.mention    = f"<@&{id}>"
+
+class FakeMember(discord.Member):
+    id = name = display_name = mention = guild = roles = bot = voice = None
+
+    def __init__(self, id: int, guild=None, roles: list = None, name: str = None):
+        self.id             = id
+        self.name           = name or f"member-{id}"
+        self.display_name   = self.name
+        self.mention        = f"<@{id}>"
+        self.guild          = guild
+        self.roles          = roles or []
+        self.bot            = False
+        self.voice          = None
+
+class FakeGuild:
+    def __init__(self, id: int, name: str = None):
+        self.id         = id
+        self.name       = name or f"guild-{id}"
+        self.members    = []
+        self.roles      = []
+        self.voice_client = None
+
+    def get_member(self, id: int):
+        return next((member for member in self.members if member.id == id), None)
+
+    def get_role(self, id: int):
+        return next((role for role in self.roles if role.id == id), None)
+
+class FakeVoiceClient:
+    """Plays a source the way discord.py's AudioPlayer does, one 20ms frame per tick on its own thread, without a socket."""
+
+    FRAME_LENGTH = 0.02
+
+    def __init__(self, encoder=None):
+        self.encoder        = encoder
+        self.source         = None
+
+        self.frames         = 0
+        self.misses         = 0
+        self.lateness_max   = 0.0
+
+        self._thread        = None
+        self._end           = threading.Event()
+        self._resumed       = threading.Event()
+        self._resumed.set()
+
+    def play(self, source, *, after=None):
+        if self.is_playing():
+            raise RuntimeError("Already playing audio.")
+
+        self.source = source
+        self._end = threading.Event()
+        self._resumed.set()
+
+        self._thread = threading.Thread(target=self._run, args=(source, after, self._end), daemon=True)
+        self._thread.start()
+
+    def _run(self, source, after, end: threading.Event):
+        error = None
+        loops = 0
+        start = time.perf_counter()
+
+        try:
+            while not end.is_set():
+                if not self._resumed.is_set():
+                    self._resumed.wait()
+                    loops = 0
+                    start = time.perf_counter()
+                    continue
+
+                loops += 1
+                data = source.read()
+                if not data:
+                    break
+
+                if self.encoder:
+                    self.encoder.encode(data, 960)
+
+                self.frames += 1
+
+                # Same pacing as discord.py's AudioPlayer, a negative delay means the frame missed its slot
+                delay = start + self.FRAME_LENGTH * loops - time.perf_counter()
+                if delay < 0:
+                    self.misses += 1
+                    self.lateness_max = max(self.lateness_max, -delay)
+
+                time.sleep(max(0, delay))
+        except Exception as e:
+            error = e
+        finally:
+            # Ended before calling after, like discord.py, so after() can start the next source
+            end.set()
+            source.cleanup()
+
+        if after:
+            after(error)
+
+    def stop(self):
+        self._end.set()
+        self._resumed.set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def is_playing(self):
+        return self._thread is not None and self._resumed.is_set() and not self._end.is_set()
+
+    def is_connected(self):
+        return True
+
+    def is_paused(self):
+        return self._thread is not None and not self._resumed.is_set() and not self._end.is_set()
+
+class FakeChannel:
+    def __init__(self, id: int, guild: FakeGuild = None):
+        self.id         = id
+        self.guild      = guild
+        self.name       = f"channel-{id}"
+
+    async def send(self, *args, **kwargs):
+        return None
+
+class FakeMessage:
+    def __init__(self, id: int, content: str, author, channel: FakeChannel):
+        self.id             = id
+        self.content        = content
+        self.author         = author
+        self.channel        = channel
+        self.guild          = channel.guild
+        self.attachments    = []
+
+class FakeContext:
+    def __init__(self, author, guild: FakeGuild, channel: FakeChannel, prefix: str = "**"):
+        self.author     = author
+        self.guild      = guild
+        self.channel    = channel
+        self.prefix     = prefix
+        self.command    = None
+
+    async def send(self, *args, **kwargs):
+        return None
+
+class FakeBot:
+    def __init__(self):
+        self.cogs       = {}
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    def run_async(self, coro):
+        # Nothing is sent anywhere, drop the coroutine without scheduling it
+        coro.close()
+
+class FakeApp:
+    """Stands in for App: in-memory sqlite instead of MySQL and no gateway connection."""
+
+    def __init__(self):
+        self.settings   = {}
+        self.node       = 0
+        self.bus        = Bus()
+        self.bot        = FakeBot()
+        self.db         = Database.from_url("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+    def _check_required_settings(self):
+        pass
+
+    def seed(self, rows: list):
+        """rows are (uid, is_role, priv_level) tuples."""
+        with self.db.session as session:
+            session.add_all([BotUser(uid=str(uid), is_role=is_role, priv_level=level) for uid, is_role, level in rows])
+            session.commit()
@@ -0,0 +1,184 @@
+"""
+Load test for concurrent MusicPlayers, fully offline.
+
+Every simulated guild gets a MusicPlayer whose voice client is a FakeVoiceClient pacing 20ms frames, fed
+by YTDLSource over a real ffmpeg process reading a local audio file. Without --file a test tone is
+generated with ffmpeg first.
+
+    python -m bench.playback --guilds 1,10,25,50 --duration 20 -o playback.json
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import discord
+
+from utils import logger
+from modules.music import MusicPlayer, Song, YTDLSource
+from .fakes import FakeGuild, FakeChannel, FakeVoiceClient
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+class LocalSong(Song):
+    """Song that loads a local file instead of extracting a URL, the rest of the YTDLSource/ffmpeg path is unchanged."""
+
+    def load(self):
+        # No -reconnect input options, those only apply to network inputs
+        self._stream = YTDLSource(discord.FFmpegPCMAudio(self._url, options='-vn'), data={
+            "title":    os.path.basename(self._url),
+            "url":      self._url
+        })
+
+    def __del__(self):
+        if self._stream:
+            self._stream.cleanup()
+
+class SilentModule:
+    def send_pretty(self, *args, **kwargs):
+        pass
+
+def generate_tone(duration: int):
+    path = os.path.join(tempfile.gettempdir(), f"dsbot-tone-{duration}s.ogg")
+    if not os.path.exists(path):
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-c:a", "libopus", path], check=True)
+    return path
+
+def _ffmpeg_children():
+    """(count, cpu seconds) of live ffmpeg processes started by this process, read from /proc."""
+    count, ticks = 0, 0
+    me = str(os.getpid())
+
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return 0, 0.0
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", 'r') as file:
+                stat = file.read()
+        except OSError:
+            continue
+
+        # comm may contain spaces, fields after the closing parenthesis are fixed
+        comm = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        if comm == "ffmpeg" and fields[1] == me:
+            count += 1
+            ticks += int(fields[11]) + int(fields[12])
+
+    return count, ticks / CLOCK_TICKS
+
+async def _lag_probe(samples: list, interval: float = 0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+def _percentile(values: list, q: float):
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+async def run_step(guilds: int, path: str, duration: float, opus: bool):
+    encoder = None
+    if opus:
+        from discord.opus import Encoder
+        encoder = Encoder
+
+    players = []
+    for i in range(guilds):
+        guild = FakeGuild(i + 1)
+        guild.voice_client = FakeVoiceClient(encoder() if encoder else None)
+
+        player = MusicPlayer(SilentModule(), guild, FakeChannel(i + 1, guild))
+        for _ in range(2):
+            player.add_song(LocalSong(path))
+        players.append(player)
+
+    lag = []
+    probe = asyncio.ensure_future(_lag_probe(lag))
+
+    cpu_start = time.process_time()
+    _, children_start = _ffmpeg_children()
+    wall_start = time.perf_counter()
+
+    for player in players:
+        player.play_next()
+
+    await asyncio.sleep(duration)
+
+    ffmpeg, children_end = _ffmpeg_children()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start + max(children_end - children_start, 0)
+
+    probe.cancel()
+
+    clients = [player.guild.voice_client for player in players]
+    frames = sum(client.frames for client in clients)
+    misses = sum(client.misses for client in clients)
+
+    for player in players:
+        player.queue = []
+        player.loop = False
+        player.guild.voice_client.stop()
+
+    return {
+        "guilds":               guilds,
+        "frames":               frames,
+        "expected_frames":      int(guilds * wall / FakeVoiceClient.FRAME_LENGTH),
+        "deadline_misses":      misses,
+        "miss_ratio":           misses / frames if frames else 0.0,
+        "lateness_max_ms":      max((client.lateness_max for client in clients), default=0.0) * 1000,
+        "cpu_per_stream_pct":   cpu / wall / guilds * 100,
+        "ffmpeg_processes":     ffmpeg,
+        "loop_lag_p50_ms":      _percentile(lag, 0.5) * 1000,
+        "loop_lag_p99_ms":      _percentile(lag, 0.99) * 1000,
+        "loop_lag_max_ms":      max(lag, default=0.0) * 1000
+    }
+
+async def run(steps: list, path: str, duration: float, opus: bool):
+    results = []
+
+    for guilds in steps:
+        result = await run_step(guilds, path, duration, opus)
+        results.append(result)
+
+        print(f"{guilds:5d} guilds  misses {result['deadline_misses']:6d} ({result['miss_ratio'] * 100:5.2f}%)  "
+              f"cpu/stream {result['cpu_per_stream_pct']:5.1f}%  ffmpeg {result['ffmpeg_processes']:4d}  "
+              f"loop lag p99 {result['loop_lag_p99_ms']:7.2f}ms max {result['loop_lag_max_ms']:7.2f}ms")
+
+        # Let the stopped players and their ffmpeg processes wind down between steps
+        await asyncio.sleep(2)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent MusicPlayer load test with a fake voice client")
+    parser.add_argument("--guilds", default="1,5,10,25,50", help="comma separated guild counts to step through")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of playback per step")
+    parser.add_argument("--file", help="local audio file, a generated tone is used when omitted")
+    parser.add_argument("--opus", action="store_true", help="also opus-encode every frame like a real voice client")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    logger.configure(level="ERR")
+
+    # Each queued copy outlasts the window on its own
+    path = args.file or generate_tone(int(args.duration) + 10)
+    steps = [int(step) for step in args.guilds.split(",")]
+
+    results = asyncio.run(run(steps, path, args.duration, args.opus))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"file": path, "duration": args.duration, "opus": args.opus, "steps": results}, file, indent=4)
+
+if __name__ == "__main__":
+    main()
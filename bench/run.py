@@ -0,0 +1,199 @@
+"""
+Offline benchmarks for the command and privilege hot paths.
+
+Needs the packages from requirements.txt but no Discord connection or MySQL server.
+
+    python -m bench.run -o results.json
+    python -m bench.run -o new.json --compare results.json
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+
+from utils import logger
+
+from app import BaseBot
+from modules import PrivSystem, PrivSystemLevels
+from modules.music import MusicPlayer
+from .fakes import FakeApp, FakeGuild, FakeChannel, FakeMember, FakeRole, FakeMessage, FakeContext
+
+def _summary(timings: list):
+    timings.sort()
+    total = sum(timings)
+    return {
+        "iterations":   len(timings),
+        "ops_sec":      len(timings) / (total / 1e9) if total else 0.0,
+        "p50_us":       timings[len(timings) // 2] / 1000,
+        "p99_us":       timings[min(int(len(timings) * 0.99), len(timings) - 1)] / 1000,
+        "max_us":       timings[-1] / 1000
+    }
+
+def bench(func, iterations: int, warmup: int):
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - start)
+
+    return _summary(timings)
+
+async def abench(func, iterations: int, warmup: int):
+    for _ in range(warmup):
+        await func()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        await func()
+        timings.append(time.perf_counter_ns() - start)
+
+    return _summary(timings)
+
+class FakeSong:
+    def __init__(self, n: int):
+        self.title      = f"song-{n}"
+        self.url        = f"https://www.youtube.com/watch?v={n}"
+        self.is_ended   = True
+
+class FakeMusicModule:
+    def send_pretty(self, *args, **kwargs):
+        pass
+
+class FakeCog:
+    """Minimal owner of a withPriv-decorated command, like a module Cog."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def raw(self, ctx):
+        return True
+
+    @PrivSystem.withPriv(PrivSystemLevels.USER)
+    async def guarded(self, ctx):
+        return True
+
+async def run(iterations: int, warmup: int):
+    fake = FakeApp()
+    guild = FakeGuild(1)
+    channel = FakeChannel(10, guild)
+
+    # 50 roles, only the last one grants IVENTOLOG, so role resolution walks the whole list
+    roles = [FakeRole(1000 + i, guild) for i in range(50)]
+    guild.roles = roles
+    member = FakeMember(1, guild, roles)
+    owner = FakeMember(2, guild)
+    guild.members = [member, owner]
+
+    fake.seed([(role.id, 1, PrivSystemLevels.USER.value if i < 49 else PrivSystemLevels.IVENTOLOG.value) for i, role in enumerate(roles)]
+              + [(member.id, 0, PrivSystemLevels.USER.value), (owner.id, 0, PrivSystemLevels.OWNER.value)])
+
+    priv = PrivSystem(fake)
+    fake.bot.cogs["PrivSystem"] = priv
+
+    results = {}
+
+    def cold():
+        priv._priv_cache.clear()
+        priv.checkPriv(owner, PrivSystemLevels.OWNER)
+
+    results["priv.check.cold"] = bench(cold, iterations // 10, warmup)
+    results["priv.check.warm"] = bench(lambda: priv.checkPriv(owner, PrivSystemLevels.OWNER), iterations, warmup)
+    results["priv.check.roles"] = bench(lambda: priv.checkPriv(member, PrivSystemLevels.IVENTOLOG), iterations, warmup)
+
+    cog = FakeCog(fake.bot)
+    ctx = FakeContext(owner, guild, channel)
+    results["priv.withPriv.raw"] = await abench(lambda: cog.raw(ctx), iterations, warmup)
+    results["priv.withPriv.guarded"] = await abench(lambda: cog.guarded(ctx), iterations, warmup)
+
+    bot = BaseBot('**', {})
+    plain = FakeMessage(100, "just chatting about nothing in particular", member, channel)
+    results["bot.on_message.filtered"] = await abench(lambda: bot.on_message(plain), iterations, warmup)
+
+    player = MusicPlayer(FakeMusicModule(), guild, channel)
+    songs = [FakeSong(i) for i in range(100)]
+
+    def add_del():
+        for song in songs:
+            player.add_song(song)
+        while player.queue:
+            player.del_song(len(player.queue) - 1)
+
+    def advance():
+        player.queue.extend(songs)
+        while player.queue:
+            player._current = None
+            player.current
+
+    results["music.queue.add_del_100"] = bench(add_del, iterations // 100, warmup)
+    results["music.queue.advance_100"] = bench(advance, iterations // 100, warmup)
+
+    return results
+
+def _version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressions = []
+
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old["p50_us"]:
+            continue
+
+        change = result["p50_us"] / old["p50_us"] - 1
+        print(f"{name:32s} p50 {old['p50_us']:10.2f}us -> {result['p50_us']:10.2f}us ({change * 100:+.1f}%)")
+        if change > threshold:
+            regressions.append(name)
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline hot path benchmarks")
+    parser.add_argument("-n", "--iterations", type=int, default=10000)
+    parser.add_argument("-w", "--warmup", type=int, default=100)
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    logger.configure(level="ERR")
+    results = asyncio.run(run(args.iterations, args.warmup))
+
+    for name, result in results.items():
+        print(f"{name:32s} {result['ops_sec']:12.0f} ops/s  p50 {result['p50_us']:10.2f}us  p99 {result['p99_us']:10.2f}us")
+
+    report = {
+        "meta": {
+            "version":      _version(),
+            "python":       platform.python_version(),
+            "platform":     platform.platform(),
+            "time":         time.time(),
+            "iterations":   args.iterations
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            regressions = compare(results, json.load(file)["results"], args.threshold)
+
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
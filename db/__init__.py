@@ -1,2 +1,2 @@
 from .db import Database
-from .db_tables import BotUser, Base
\ No newline at end of file
+from .db_tables import BotUser, BotJob, Base
\ No newline at end of file
@@ -7,9 +7,19 @@ from .db_tables import Base
 class Database:
 
     def __init__(self, host: str, port: int, user: str, passwd: str, db: str):
+        self._connect('mysql+mysqlconnector://{}:{}@{}:{}/{}'.format(user, passwd, host, port, db), pool_recycle=280)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs):
+        """Builds a Database on any SQLAlchemy URL, e.g. an in-memory sqlite one for benchmarks."""
+        inst = cls.__new__(cls)
+        inst._connect(url, **kwargs)
+        return inst
+
+    def _connect(self, url: str, **kwargs):
         self._semaphore = threading.Semaphore(15)
 
-        self.engine = create_engine('mysql+mysqlconnector://{}:{}@{}:{}/{}'.format(user, passwd, host, port, db), pool_recycle=280)
+        self.engine = create_engine(url, **kwargs)
         self.Session = sessionmaker(bind=self.engine)
 
         Base.metadata.create_all(self.engine)
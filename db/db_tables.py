@@ -14,4 +14,16 @@ class BotUser(Base, Wrapper):
     id          = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     uid         = sa.Column(sa.VARCHAR(100), nullable=False)
     is_role     = sa.Column(sa.Integer, nullable=True, default=0)
-    priv_level  = sa.Column(sa.Integer, nullable=False)
\ No newline at end of file
+    priv_level  = sa.Column(sa.Integer, nullable=False)
+
+class BotJob(Base, Wrapper):
+    __tablename__ = "bot_jobs"
+
+    id          = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    node        = sa.Column(sa.Integer, nullable=False, default=0)
+    guild_id    = sa.Column(sa.VARCHAR(100), nullable=True)
+    kind        = sa.Column(sa.VARCHAR(100), nullable=False)
+    state       = sa.Column(sa.VARCHAR(20), nullable=False)
+    params      = sa.Column(sa.Text, nullable=False)
+    checkpoint  = sa.Column(sa.Text, nullable=True)
+    progress    = sa.Column(sa.VARCHAR(255), nullable=True)
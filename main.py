@@ -1,10 +1,10 @@
 import app
 from modules import *
 
-_app = app.App()
+def setup(_app: app.App):
+    _app.addModule(PrivSystem)
+    _app.addModule(MiscCommands)
+    _app.addModule(Music)
 
-_app.addModule(PrivSystem)
-_app.addModule(MiscCommands)
-_app.addModule(Music)
-
-_app.run()
\ No newline at end of file
+if __name__ == "__main__":
+    app.launch(setup)
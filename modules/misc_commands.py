@@ -1,56 +1,388 @@
 import asyncio 
+import datetime
 
 import discord
 from discord.ext import commands
 
-from app import App, AppModule
-from utils import LogLevel, BotInternalException, split_array
+from app import App, AppModule, PrettyType, BaseBot, Job
+from utils import Log, LogLevel, BotInternalException, metrics, profiler, watchdog, pools
 from .priv_system import PrivSystem, PrivSystemLevels
 
+class CleanPipeline(Log):
+    """Deletes matching messages while history is still being read, memory stays bounded by the queues."""
+
+    # Discord refuses bulk deletes of messages older than 14 days, keep a margin for clock skew
+    BULK_MAX_AGE    = datetime.timedelta(days=14) - datetime.timedelta(minutes=10)
+    BULK_SIZE       = 100
+
+    def __init__(self, channel, predicate, checkpoint: dict = None):
+        checkpoint      = checkpoint or {}
+
+        self.channel    = channel
+        self.predicate  = predicate
+
+        self.before     = checkpoint.get("before")
+        self.scanned    = checkpoint.get("scanned", 0)
+        self.deleted    = checkpoint.get("deleted", 0)
+        self.failed     = checkpoint.get("failed", 0)
+
+        # Ids queued but not yet deleted, a resume has to start above the newest of them
+        self._pending   = set()
+
+        self._bulk      = asyncio.Queue(maxsize=2)
+        self._single    = asyncio.Queue(maxsize=self.BULK_SIZE)
+        self._delay     = 0.0
+
+    @property
+    def checkpoint(self):
+        return {
+            "before":   max(self._pending) + 1 if self._pending else self.before,
+            "scanned":  self.scanned,
+            "deleted":  self.deleted,
+            "failed":   self.failed
+        }
+
+    @property
+    def progress(self):
+        return f"Scanned {self.scanned} messages, removed {self.deleted}" + (f", {self.failed} failed" if self.failed else "")
+
+    async def _deleteOne(self, message: discord.Message):
+        # Single deletes share one rate limit bucket, back off when it pushes back and speed up again after
+        for _ in range(3):
+            try:
+                await message.delete()
+                self._pending.discard(message.id)
+                self.deleted += 1
+                self._delay /= 2
+                break
+            except discord.NotFound:
+                self._pending.discard(message.id)
+                break
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    self._pending.discard(message.id)
+                    self.failed += 1
+                    break
+
+                self._delay = min(max(self._delay * 2, 1.0), 30.0)
+                await asyncio.sleep(self._delay)
+            except Exception as e:
+                # Connection resets and the like, one message must not take the worker down
+                self.log(f"Deleting message {message.id} failed: {e}", LogLevel.WARN, ratelimit="clean")
+                self._pending.discard(message.id)
+                self.failed += 1
+                break
+        else:
+            self._pending.discard(message.id)
+            self.failed += 1
+
+        if self._delay > 0.05:
+            await asyncio.sleep(self._delay)
+
+    async def _bulkWorker(self):
+        while (batch := await self._bulk.get()) is not None:
+            if len(batch) == 1:
+                await self._deleteOne(batch[0])
+                continue
+
+            try:
+                await self.channel.delete_messages(batch)
+                self._pending.difference_update(message.id for message in batch)
+                self.deleted += len(batch)
+            except Exception as e:
+                self.log(f"Bulk delete of {len(batch)} messages failed: {e}", LogLevel.WARN)
+                for message in batch:
+                    await self._single.put(message)
+
+    async def _singleWorker(self):
+        while (message := await self._single.get()) is not None:
+            await self._deleteOne(message)
+
+    async def _watch(self, future, workers: list):
+        """Awaits future unless a worker stops first, then raises instead of waiting on a queue nobody reads."""
+        future = asyncio.ensure_future(future)
+        try:
+            done, _ = await asyncio.wait({future, *workers}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+        if future in done:
+            return future.result()
+
+        future.cancel()
+        for worker in done:
+            worker.result()
+
+        raise BotInternalException("Message deletion stopped unexpectedly")
+
+    async def _put(self, queue: asyncio.Queue, item, workers: list):
+        if queue.full():
+            await self._watch(queue.put(item), workers)
+        else:
+            queue.put_nowait(item)
+
+    async def run(self):
+        bulk = not isinstance(self.channel, (discord.DMChannel, discord.GroupChannel))
+        cutoff = discord.utils.utcnow() - self.BULK_MAX_AGE
+
+        bulk_worker = asyncio.ensure_future(self._bulkWorker())
+        single_worker = asyncio.ensure_future(self._singleWorker())
+        workers = [bulk_worker, single_worker]
+
+        try:
+            batch = []
+
+            before = discord.Object(id=self.before) if self.before else None
+
+            async for message in self.channel.history(limit=None, before=before):
+                self.scanned += 1
+                self.before = message.id
+
+                if not self.predicate(message):
+                    continue
+
+                self._pending.add(message.id)
+
+                if bulk and message.created_at > cutoff:
+                    batch.append(message)
+                    if len(batch) >= self.BULK_SIZE:
+                        await self._put(self._bulk, batch, workers)
+                        batch = []
+                else:
+                    await self._put(self._single, message, workers)
+
+            if batch:
+                await self._put(self._bulk, batch, workers)
+
+            await self._put(self._bulk, None, workers)
+            await self._watch(bulk_worker, [single_worker])
+            # Bulk failures fall back to the single lane, so it is closed last
+            await self._put(self._single, None, [single_worker])
+            await single_worker
+        finally:
+            bulk_worker.cancel()
+            single_worker.cancel()
+
 class MiscCommands(commands.Cog, AppModule):
     def __init__(self, app: App):
         super(MiscCommands, self).__init__(app)
+        self._profile_task = None
 
-    async def remove_list(self, ctx, messages):
-        channel = ctx.message.channel
+        self.app.jobs.register("cleanmsg", self._cleanJob)
 
-        if isinstance(channel, discord.DMChannel):
-            for msg in messages:
-                await msg.delete()
-                await asyncio.sleep(1)
-        else:
-            await channel.delete_messages(messages)
+    def exportState(self) -> dict:
+        return {"profile_task": self._profile_task}
+
+    def importState(self, state: dict):
+        self._profile_task = state.get("profile_task")
+        if self._profile_task:
+            self._profile_task.add_done_callback(self._profileDone)
+
+    def _profileDone(self, task: asyncio.Task):
+        if self._profile_task is task:
+            self._profile_task = None
+
+    async def _edit(self, msg: discord.PartialMessage, message: str):
+        # The status message may have been removed by hand, that must not fail the job
+        try:
+            await BaseBot.edit(msg, message)
+        except BotInternalException:
+            pass
+
+    async def _cleanJob(self, job: Job):
+        params = job.params
+        channel = self.bot.get_channel(params["channel_id"]) or await self.bot.fetch_channel(params["channel_id"])
+        status = channel.get_partial_message(params["status_id"])
+
+        exclude = (params["command_id"], params["status_id"])
+        only_bot = params["mode"] == "onlybot"
+
+        pipeline = CleanPipeline(channel, lambda message: message.id not in exclude and (not only_bot or message.author == self.bot.user), job.checkpoint)
+        task = asyncio.ensure_future(pipeline.run())
+
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=3)
+                if not task.done():
+                    await job.update(pipeline.checkpoint, pipeline.progress)
+                    await self._edit(status, pipeline.progress)
+
+            await task
+        finally:
+            task.cancel()
+            job.checkpoint = pipeline.checkpoint
+
+        job.progress = f"Removed {pipeline.deleted} messages" + (f", {pipeline.failed} failed" if pipeline.failed else "")
+        await self._edit(status, job.progress)
+
+    async def _clean(self, ctx: commands.Context, mode: str):
+        status = await BaseBot.send(ctx, "Removing messages...", ephemeral=False)
+
+        job = await self.app.jobs.submit("cleanmsg", ctx.guild.id if ctx.guild else None,
+                                         mode=mode,
+                                         channel_id=ctx.channel.id,
+                                         command_id=ctx.message.id,
+                                         status_id=status.id)
+        self.log(f"Submitted cleanmsg {mode} as job {job.id}")
 
     @commands.hybrid_group(name="cleanmsg", fallback="onlybot")
     @PrivSystem.withPriv(PrivSystemLevels.OWNER)
     async def clean(self, ctx: commands.Context):
-        channel = ctx.message.channel
-        
-        messages = [message async for message in channel.history(limit=1000000)]
-        messages_filtered = [message for message in messages if message.author == self.bot.user and message.id != ctx.message.id]
-        message_arrays = split_array(messages_filtered, 100)
-
-        for message_array in message_arrays:        
-            await self.remove_list(ctx, message_array)
-            
-        self.send(channel, f"Removed {len(messages_filtered)} messages")
+        await self._clean(ctx, "onlybot")
 
     @clean.command(name="all")
     @PrivSystem.withPriv(PrivSystemLevels.OWNER)
     async def cleanAll(self, ctx: commands.Context):
-        channel = ctx.message.channel
-        
-        messages = [message async for message in channel.history(limit=1000000)]
-        messages_filtered = [message for message in messages if message.id != ctx.message.id]
-        message_arrays = split_array(messages_filtered, 100)
-        
-        for message_array in message_arrays:
-            await self.remove_list(ctx, message_array)
-            
-        self.send(channel, f"Removed {len(messages)} messages")
+        await self._clean(ctx, "all")
         
+    @commands.hybrid_group(name="job", fallback="list")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def job(self, ctx: commands.Context):
+        jobs = self.app.jobs.list(ctx.guild.id if ctx.guild else None)
+        lines = [f"#{job.id} {job.kind} [{job.state.value}] {job.progress}" for job in jobs]
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Jobs", message="\n".join(lines) or "No running jobs")
+
+    @job.command(name="cancel")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def jobCancel(self, ctx: commands.Context, id: int):
+        job = self.app.jobs.jobs.get(id)
+        if not job or job.guild_id != (ctx.guild.id if ctx.guild else None):
+            raise BotInternalException(f"No running job #{id}")
+
+        self.app.jobs.cancel(id)
+        self.send_pretty(ctx, PrettyType.SUCCESS, title="Job cancelled", fields={
+            "Job": f"#{id} {job.kind}"
+        })
+
+    @commands.hybrid_group(name="module", fallback="list")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def module(self, ctx: commands.Context):
+        self.send_pretty(ctx, PrettyType.INFO, title="Modules", message="\n".join(self.app.modules.keys()))
+
+    @module.command(name="reload")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def moduleReload(self, ctx: commands.Context, name: str):
+        elapsed = await self.app.reloadModule(name)
+        await BaseBot.send_pretty(ctx, PrettyType.SUCCESS, title="Module reloaded", fields={
+            "Module": name,
+            "Time": f"{elapsed * 1000:.0f}ms"
+        })
+
+    @commands.hybrid_command()
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def msgstats(self, ctx: commands.Context):
+        stats = self.bot.message_stats
+        total = stats["filtered"] + stats["dispatched"]
+        ratio = (stats["filtered"] / total * 100) if total else 0
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Message dispatch", fields={
+            "Filtered": stats["filtered"],
+            "Dispatched": stats["dispatched"],
+            "Filtered %": f"{ratio:.1f}"
+        })
+
     @commands.hybrid_command()
-    @PrivSystem.withPriv(PrivSystemLevels.USER)
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def perf(self, ctx: commands.Context):
+        summary = metrics.summary()
+        lines = [
+            f"{command} [{stage}] n={s['count']} avg={s['avg'] * 1000:.1f}ms p50<={s['p50'] * 1000:.0f}ms p99<={s['p99'] * 1000:.0f}ms max={s['max'] * 1000:.1f}ms"
+            for (command, stage), s in sorted(summary.items(), key=lambda item: item[1]["sum"], reverse=True)[:20]
+        ]
+        errors = "\n".join(f"{error}: {count}" for error, count in metrics.errors().items())
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Command latency", message="\n".join(lines) or "No data", fields={
+            "Errors": errors or "None"
+        })
+
+    @commands.hybrid_command()
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
     async def sync(self, ctx: commands.Context):
-        num = await self.bot.tree.sync()
-        self.send(ctx, f"Synced {len(num)} commands")
\ No newline at end of file
+        num = await self.app.syncCommands(force=True)
+        self.send(ctx, f"Synced {len(num)} commands")
+
+    @commands.hybrid_command()
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def memreport(self, ctx: commands.Context):
+        guilds = self.bot.guilds
+        cached = sum(len(guild.members) for guild in guilds)
+        total = sum(guild.member_count or 0 for guild in guilds)
+        lru = self.bot.members
+
+        # resource is Unix only, ru_maxrss is in KiB on Linux
+        try:
+            import resource
+            rss = f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB"
+        except ImportError:
+            rss = "n/a"
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Memory report", fields={
+            "Mode": self.bot.member_cache_mode,
+            "Guilds": len(guilds),
+            "Cached members": f"{cached} / {total}",
+            "Not cached": f"{total - cached} ({(total - cached) / total * 100 if total else 0:.1f}%)",
+            "LRU": f"{len(lru)} / {lru.size} (hits {lru.hits}, misses {lru.misses})",
+            "Users": len(self.bot.users),
+            "Peak RSS": rss
+        })
+
+    @commands.hybrid_command(name="pools")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def poolStats(self, ctx: commands.Context):
+        fields = {}
+        for name, pool in pools.pools.items():
+            s = pool.stats()
+            fields[name] = f"{s['kind']} x{s['size']}\nrunning {s['running']}, queued {s['queued']}\nsubmitted {s['submitted']}, rejected {s['rejected']}\nwait avg {s['wait_avg'] * 1000:.1f}ms, max {s['wait_max'] * 1000:.1f}ms"
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Executor pools", message=None if fields else "No pools in use", fields=fields)
+
+    @commands.hybrid_command()
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def stalls(self, ctx: commands.Context):
+        ranking = watchdog.ranking()
+        lines = [f"{count}x total={total:.2f}s worst={worst * 1000:.0f}ms {culprit}" for culprit, (count, total, worst) in ranking]
+
+        self.send_pretty(ctx, PrettyType.INFO, title="Event loop stalls", message="\n".join(lines) or "No stalls recorded")
+
+    async def _send_profile(self, channel):
+        report, path = profiler.stop()
+        await channel.send(f"```\n{report[:1900]}\n```", file=discord.File(path))
+
+    async def _profile_window(self, channel, seconds: int):
+        await asyncio.sleep(seconds)
+        await self._send_profile(channel)
+
+    @commands.hybrid_group(name="profile", fallback="status")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def profile(self, ctx: commands.Context):
+        if profiler.running:
+            self.send_pretty(ctx, PrettyType.INFO, title="Profiler running", fields={
+                "Mode": profiler.mode
+            })
+        else:
+            self.send_pretty(ctx, PrettyType.INFO, title="Profiler idle", fields={
+                "Modes": ", ".join(profiler.MODES)
+            })
+
+    @profile.command(name="start")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def profileStart(self, ctx: commands.Context, mode: str, seconds: int = 30):
+        profiler.start(mode)
+        self._profile_task = self.bot.run_async(self._profile_window(ctx.channel, seconds))
+        self._profile_task.add_done_callback(self._profileDone)
+
+        self.send_pretty(ctx, PrettyType.SUCCESS, title="Profiler started", fields={
+            "Mode": mode,
+            "Window": f"{seconds}s"
+        })
+
+    @profile.command(name="stop")
+    @PrivSystem.withPriv(PrivSystemLevels.OWNER)
+    async def profileStop(self, ctx: commands.Context):
+        if self._profile_task:
+            self._profile_task.cancel()
+            self._profile_task = None
+
+        await self._send_profile(ctx.channel)
@@ -1,6 +1,6 @@
+import time
 import asyncio 
-import yt_dlp as youtube_dl
-from googleapiclient.discovery import build as yt_build
+import functools
 
 from typing import Union
 from functools import wraps
@@ -9,9 +9,13 @@ import discord
 from discord.ext import commands
 
 from app import App, AppModule, PrettyType, BaseBot
-from utils import Log, LogLevel, BotInternalException, split_array
+from utils import Log, LogLevel, BotInternalException, split_array, metrics, pools, lazy_import
 from .priv_system import PrivSystem, PrivSystemLevels
 
+# Heavy dependencies, imported on first use instead of at startup
+youtube_dl      = lazy_import("yt_dlp")
+yt_discovery    = lazy_import("googleapiclient.discovery")
+
 ytdl_format_options = {
     'format': 'bestaudio/best',
     'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
@@ -39,45 +43,96 @@ ffmpeg_options = {
     'options': '-vn'
 }
 
-ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
+@functools.cache
+def get_ytdl():
+    return youtube_dl.YoutubeDL(ytdl_format_options)
 
 class YTDLSource(discord.PCMVolumeTransformer, Log):
-    def __init__(self, source, *, data, volume=0.5):
+    FRAME_LENGTH = 0.02
+
+    def __init__(self, source, *, data, volume=0.5, start=0.0):
         super().__init__(source, volume)
 
         self.data = data
+        self.start = start
+        self.frames = 0
 
         self.title = data.get('title')
         self.url = data.get('url')
         
-        self.log(f"YTDLSource: {self.title} created")
+        self.log(f"YTDLSource: {self.title} created", LogLevel.DEBUG, ratelimit="music")
         
     def __del__(self):
-        self.log(f"YTDLSource: {self.title} deleted")
-        
+        self.log(f"YTDLSource: {self.title} deleted", LogLevel.DEBUG, ratelimit="music")
+
+    def read(self):
+        data = super().read()
+        if data:
+            self.frames += 1
+        return data
+
+    @property
+    def position(self):
+        """Seconds into the track of the last frame handed to the voice client."""
+        return self.start + self.frames * self.FRAME_LENGTH
+
+    @classmethod
+    def from_data(cls, data, *, start=0.0):
+        """Opens an already extracted stream URL, seeking to start seconds without downloading what is skipped."""
+        options = dict(ffmpeg_options)
+        if start:
+            options['before_options'] = f"-ss {start:.2f} {options['before_options']}"
+
+        return cls(discord.FFmpegPCMAudio(data['url'], **options), data=data, start=start)
+
     @classmethod
-    def from_url(cls, url, *, stream=False):
-        ytdl.cache.remove()
-        data = ytdl.extract_info(url, download=not stream)
+    def from_url(cls, url, *, stream=False, start=0.0):
+        ytdl = get_ytdl()
+
+        with metrics.timed("extract"):
+            ytdl.cache.remove()
+            data = ytdl.extract_info(url, download=not stream)
 
         if 'entries' in data:
             data = data['entries'][0]
 
-        filename = data['url'] if stream else ytdl.prepare_filename(data)
-        return cls(discord.FFmpegPCMAudio(filename, **ffmpeg_options), data=data)
+        if stream:
+            return cls.from_data(data, start=start)
+
+        return cls(discord.FFmpegPCMAudio(ytdl.prepare_filename(data), **ffmpeg_options), data=data)
 
 class Song(Log):
+    # Extracted stream URLs expire after a few hours, reuse them only while they are surely valid
+    STREAM_URL_TTL = 1800
+
     def __init__(self, url):
         self._stream : YTDLSource = None
+        self._extracted = 0.0
         self._url = url
-        self.log(f"Song: {self.url} created")
+        self.failures = 0
+        self.log(f"Song: {self.url} created", LogLevel.DEBUG, ratelimit="music")
 
     def __del__(self):
-        self.log(f"Song: {self.url} deleted")
+        self.log(f"Song: {self.url} deleted", LogLevel.DEBUG, ratelimit="music")
         self.stream.cleanup()
 
     def load(self):
         self._stream = YTDLSource.from_url(self._url, stream=True)
+        self._extracted = time.monotonic()
+
+    def seek(self, position: float) -> YTDLSource:
+        """Reopens the track at position, reusing the cached stream URL when it is fresh enough."""
+        if self._stream and time.monotonic() - self._extracted < self.STREAM_URL_TTL:
+            self._stream = YTDLSource.from_data(self._stream.data, start=position)
+        else:
+            self._stream = YTDLSource.from_url(self._url, stream=True, start=position)
+            self._extracted = time.monotonic()
+
+        return self._stream
+
+    @property
+    def position(self):
+        return self._stream.position if self._stream else 0.0
 
     @property
     def is_ended(self):
@@ -107,6 +162,10 @@ class Song(Log):
             return f"https://www.youtube.com/watch?v={self._url}"
         
 class MusicPlayer(Log):
+    # Playback errors resumed in a row before the song is given up, a stream that plays this long counts as recovered
+    MAX_RECOVER_ATTEMPTS = 3
+    RECOVER_RESET_AFTER = 10.0
+
     def __init__(self, module : AppModule, guild : discord.Guild, text : discord.TextChannel):
         self.module = module
         self.text = text
@@ -114,6 +173,11 @@ class MusicPlayer(Log):
         self._current : Song = None
         self.queue = []
         self.loop = False
+
+        self.voice_channel : discord.VoiceChannel = None
+        self.leaving = False
+        self.recovering = False
+        self.resume_at = None
     
     def add_song(self, song):
         if len(self.queue) > 0 or self.current:
@@ -135,8 +199,77 @@ class MusicPlayer(Log):
             self.module.send_pretty(self.text, PrettyType.ERROR, title = "Index out of range")
 
     def _after(self, e):
+        voice_client = self.guild.voice_client
+
+        # recover() already started the resumed stream, this is the old one finishing
+        if voice_client and voice_client.is_playing():
+            return
+
+        # A dropped connection or a playback error is not the end of the song, resume it instead of skipping.
+        # ffmpeg exiting on its own reads as b'' and still ends the song like before.
+        song = self._current
+        if song and not self.leaving and (e or not voice_client or not voice_client.is_connected()):
+            self.resume_at = song.position
+            self.log(f"Playback interrupted at {self.resume_at:.1f}s ({e if e else 'voice disconnected'})", LogLevel.WARN)
+
+            if e and voice_client and voice_client.is_connected():
+                if song._stream and song._stream.frames * YTDLSource.FRAME_LENGTH >= self.RECOVER_RESET_AFTER:
+                    song.failures = 0
+                song.failures += 1
+
+                if song.failures <= self.MAX_RECOVER_ATTEMPTS:
+                    delay = 2 ** (song.failures - 1)
+                    asyncio.run_coroutine_threadsafe(self.recover(delay=delay), self.module.bot.loop)
+                    return
+
+                # The same spot keeps failing, a bad stream or encoder error, move on instead of looping
+                self.log(f"Giving up on {song.url} after {song.failures - 1} resume attempts", LogLevel.ERR)
+                song.failures = 0
+                self.resume_at = None
+                self._current = None
+            else:
+                return
+
         self.play_next()
 
+    async def recover(self, channel : discord.VoiceChannel = None, delay : float = 0):
+        """Reconnects to the voice channel if needed and continues the current song from where it stopped."""
+        if self.recovering or self.leaving:
+            return
+
+        self.recovering = True
+
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+                if self.leaving:
+                    return
+
+            start = time.perf_counter()
+            voice_client = self.guild.voice_client
+            channel = channel or self.voice_channel
+
+            if not voice_client or not voice_client.is_connected():
+                if voice_client:
+                    await voice_client.disconnect(force=True)
+                await channel.connect(timeout=10)
+
+            song = self._current
+            if not song:
+                return
+
+            position = self.resume_at if self.resume_at is not None else song.position
+            self.resume_at = None
+
+            stream = await pools.get("extract").run(song.seek, position)
+            self.guild.voice_client.play(stream, after=self._after)
+
+            self.log(f"Resumed {stream.title} at {position:.1f}s after {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            self.log(f"Voice recovery failed: {e}", LogLevel.ERR)
+        finally:
+            self.recovering = False
+
     def _play(self, song : Song):
         self.guild.voice_client.play(song.stream, after=self._after)
 
@@ -180,6 +313,8 @@ class MusicPlayer(Log):
         if self.current:
             self._play(self.current)
         else:
+            # Nothing is in progress any more, a later voice drop must not bring the finished song back
+            self._current = None
             self._stop()
             self.module.send_pretty(self.text, PrettyType.INFO, title = "Queue is empty")
 
@@ -228,11 +363,34 @@ class Music(commands.Cog, AppModule):
             "google_api_key"    
         ])
 
-        self.youtube = yt_build('youtube', 'v3', developerKey=self.settings["google_api_key"])
+        # Built in the background, the first search waits for it if it is not done yet
+        self._youtube = pools.get("io").submit(self._buildYoutube)
         self.music_players = {}
 
+    def _buildYoutube(self):
+        start = time.perf_counter()
+        youtube = yt_discovery.build('youtube', 'v3', developerKey=self.settings["google_api_key"])
+        self.app._phase("youtube (background)", start)
+        return youtube
+
+    @property
+    def youtube(self):
+        return self._youtube.result()
+
+    def exportState(self) -> dict:
+        return {"music_players": self.music_players}
+
+    def importState(self, state: dict):
+        self.music_players = state.get("music_players", {})
+
+        # Running players move to the reloaded code, voice clients and their streams are untouched
+        for player in self.music_players.values():
+            player.module = self
+            player.__class__ = MusicPlayer
+
     def _find(self, query : str, max_results : int = 1):
-        return self.youtube.search().list(q=query, part='id', maxResults=max_results).execute()
+        with metrics.timed("search"):
+            return self.youtube.search().list(q=query, part='id', maxResults=max_results).execute()
 
     async def _join(self, ctx : commands.Context, channel : discord.VoiceChannel):
         if ctx.voice_client:
@@ -246,6 +404,9 @@ class Music(commands.Cog, AppModule):
             await channel.connect()
 
     async def _leave(self, ctx : commands.Context):
+        if ctx.guild.id in self.music_players:
+            self.music_players[ctx.guild.id].leaving = True
+
         if ctx.voice_client:
             self.send_pretty(ctx, PrettyType.SUCCESS, title = "Left", fields = {
                 "Channel": ctx.voice_client.channel.mention
@@ -269,11 +430,26 @@ class Music(commands.Cog, AppModule):
         if channel.guild.id in self.music_players:
             player = self.music_players[channel.guild.id]
             player.channel = ctx.channel
-            return player
         else:
             player = MusicPlayer(self, ctx.guild, ctx.channel)
             self.music_players[channel.guild.id] = player
-            return player
+
+        if join:
+            player.voice_channel = ctx.voice_client.channel if ctx.voice_client else channel
+            player.leaving = False
+
+        return player
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member : discord.Member, before : discord.VoiceState, after : discord.VoiceState):
+        # Only our own drops matter, a deliberate leave sets player.leaving first
+        if member.id != self.bot.user.id or before.channel is None or after.channel is not None:
+            return
+
+        player = self.music_players.get(member.guild.id)
+        if player and player._current and not player.leaving:
+            self.log(f"Voice connection to {before.channel.name} dropped, reconnecting")
+            await player.recover(before.channel)
 
     def silent():
         def decorator(func):
@@ -10,9 +10,11 @@ from discord.ext import commands
 from discord.utils import get
 
 from app import AppModule, PrettyType, BaseBot
-from utils import LogLevel, BotInternalException
+from utils import LogLevel, BotInternalException, LRUCache, metrics, to_thread
 from db import BotUser
 
+_MISSING = object()
+
 class PrivSystemLevels(Enum):
     OWNER       = 0
     ADMIN       = 1
@@ -44,6 +46,7 @@ class PrivView(discord.ui.View):
             user = session.query(BotUser).filter_by(uid=self.uid, is_role=self.is_role).first()
             user.priv_level = perm.value
             session.commit()
+            self.module.invalidate(self.uid, self.is_role)
                     
             guild = interaction.guild
             uid = int(user.uid)
@@ -55,7 +58,7 @@ class PrivView(discord.ui.View):
                     if role:
                         fields["Name"] = role.mention
                 else:
-                    _user = guild.get_member(uid)
+                    _user = await self.module.bot.getMember(guild, uid)
                     if _user:
                         fields["Name"] = _user.mention
             
@@ -63,18 +66,177 @@ class PrivView(discord.ui.View):
             
             await BaseBot.send_pretty(interaction, PrettyType.SUCCESS, title="Permissions changed", fields=fields)
         
+class PrivListView(discord.ui.View):
+    """Pages through the privilege rows of one guild.
+
+    The cursor is a position in the guild's id list, built once per view. A page looks at no more than
+    PAGE_CHUNKS * UID_CHUNK ids of it, so a page may come up short while Next still has more to show.
+    """
+
+    def __init__(self, module: AppModule, ctx: commands.Context, uids: list):
+        super().__init__(timeout=300)
+        self.module = module
+        self.ctx = ctx
+        self.uids = uids
+        self.message : discord.Message = None
+
+        # Position in uids every page shown so far starts at, the last entry is where the next page starts
+        self.starts = [0]
+        self.page = 0
+        self.has_next = False
+
+    async def render(self):
+        rows, next_start = await self.module.getUsersPage(self.uids, self.starts[self.page], self.module.page_size)
+        self.has_next = next_start is not None
+
+        if self.has_next and len(self.starts) == self.page + 1:
+            self.starts.append(next_start)
+
+        self.previous_callback.disabled = self.page == 0
+        self.next_callback.disabled = not self.has_next
+
+        lines = []
+        guild = self.ctx.guild
+        empty = "Nothing in this range, more under Next" if self.has_next else "Empty"
+        for row in rows:
+            uid = int(row.uid)
+            level = PrivSystemLevels(row.priv_level).name
+
+            if row.is_role:
+                role = guild.get_role(uid)
+                if role:
+                    lines.append(f"[ROLE] {role.mention} ({level})")
+            else:
+                member = await self.module.bot.getMember(guild, uid)
+                if member:
+                    lines.append(f"[USER] {member.mention} ({level})")
+
+        footer = f"Page {self.page + 1}"
+        if self.module.bot.member_cache_mode == "lean":
+            # Without the full member list only voice and recently active members can be matched
+            footer += " | Only members seen recently are listed"
+
+        return BaseBot.pretty_embed(PrettyType.INFO, title="User & role list", message="\n".join(lines) or empty, footer=footer)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return interaction.user.id == self.ctx.author.id
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # Rendering may fetch members over REST, acknowledge first so the 3 second interaction deadline can't pass
+        await interaction.response.defer()
+        self.page = max(self.page - 1, 0)
+        await interaction.edit_original_response(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+        if self.has_next:
+            self.page += 1
+        await interaction.edit_original_response(embed=await self.render(), view=self)
+
 class PrivSystem(commands.Cog, AppModule):
+    UID_CHUNK = 500
+    PAGE_CHUNKS = 4
 
     def __init__(self, app):
         super(PrivSystem, self).__init__(app)
         self.priv_levels = list(PrivSystemLevels)
+        self.page_size = self.settings.get("priv_page_size", 20)
+
+        # (uid, is_role) -> PrivSystemLevels, or None for roles without a row. Entries expire so rows
+        # edited outside the bot are picked up, misses sooner since roles without a row are the common case
+        self._priv_cache = LRUCache(self.settings.get("priv_cache_size", 4096))
+        self._priv_ttl = self.settings.get("priv_cache_ttl", 300)
+        self._priv_miss_ttl = self.settings.get("priv_cache_miss_ttl", 30)
+        self.app.bus.subscribe("priv_invalidate", self._dropCached)
+
+    def exportState(self) -> dict:
+        return {"priv_cache": self._priv_cache}
+
+    def importState(self, state: dict):
+        if isinstance(state.get("priv_cache"), LRUCache):
+            self._priv_cache = state["priv_cache"]
+
+    def unload(self):
+        self.app.bus.unsubscribe("priv_invalidate", self._dropCached)
+
+    def _dropCached(self, uid: str, is_role: bool):
+        self._priv_cache.pop((uid, bool(is_role)), None)
+
+    def invalidate(self, uid: str, is_role: bool):
+        self._dropCached(uid, is_role)
+        self.app.bus.publish("priv_invalidate", uid=uid, is_role=bool(is_role))
+
+    def _cachedPriv(self, obj):
+        key = (str(obj.id), isinstance(obj, Role))
+
+        level = self._priv_cache.get(key, _MISSING)
+
+        if level is _MISSING:
+            try:
+                level = self.getPriv(obj)
+                self._priv_cache.put(key, level, ttl=self._priv_ttl)
+            except BotInternalException:
+                level = None
+                self._priv_cache.put(key, level, ttl=self._priv_miss_ttl)
+
+        return level
 
     def getUsers(self, session):
         return session.query(BotUser).all()
+
+    @to_thread("db")
+    def getUsersPage(self, uids: list, start: int, limit: int):
+        """Up to limit rows for uids[start:], in uids order. Returns (rows, next start or None when done).
+
+        uids are looked up UID_CHUNK at a time and at most PAGE_CHUNKS queries run per call, so the cost
+        of a page is bounded no matter how large the guild is.
+        """
+        found = []
+        chunks = 0
+
+        with self.db.session as session:
+            while start < len(uids) and len(found) <= limit and chunks < self.PAGE_CHUNKS:
+                chunk = uids[start:start + self.UID_CHUNK]
+                rows = {row.uid: row for row in session.query(BotUser).filter(BotUser.uid.in_(chunk)).all()}
+                found.extend((start + i, rows[uid]) for i, uid in enumerate(chunk) if uid in rows)
+                start += len(chunk)
+                chunks += 1
+
+            session.expunge_all()
+
+        if len(found) > limit:
+            return [row for _, row in found[:limit]], found[limit][0]
+
+        return [row for _, row in found], start if start < len(uids) else None
+
+    def guildUids(self, guild: discord.Guild):
+        """Ids of the roles and then the known members of guild, as stored in BotUser.uid.
+
+        Roles come first so they fill the first page with a single small query.
+        """
+        roles = [str(role.id) for role in guild.roles]
+
+        members = {str(member.id) for member in guild.members}
+        # In lean member cache mode guild.members only holds voice members, add the recently seen ones
+        members.update(str(uid) for (guild_id, uid), member in self.bot.members.items() if guild_id == guild.id and member)
+
+        return roles + sorted(members)
     
     def admined(func):
         def wrapper(self, obj, *args, **kwargs):
-            with self.db.session as session:
+            with metrics.timed("db"), self.db.session as session:
                 is_role = isinstance(obj, Role)
                 uid = str(obj.id)
 
@@ -96,25 +258,22 @@ class PrivSystem(commands.Cog, AppModule):
                 return func(self, session, uid, user, *args, **kwargs)
         return wrapper
 
-    @admined
-    def _checkPriv(self, session, uid, user, priv_level : PrivSystemLevels):
-        return PrivSystemLevels(user.priv_level).value <= priv_level.value
+    def _checkPriv(self, obj, priv_level : PrivSystemLevels):
+        level = self._cachedPriv(obj)
+        return level is not None and level.value <= priv_level.value
 
     def checkPriv(self, user, priv_level : PrivSystemLevels):
         if self._checkPriv(user, priv_level):
-            self.log(f"Access granted to {user.display_name} ({user.id})")
+            self.log(f"Access granted to {user.display_name} ({user.id})", ratelimit="priv")
             return True
         
         if isinstance(user, Member):
             for role in user.roles:
-                try:
-                    if self._checkPriv(role, priv_level):
-                        self.log(f"Access granted to {user.display_name} ({user.id}) by role {role.name} ({role.id})")
-                        return True
-                except:
-                    pass
-
-        self.log(f"Access denied for {user.display_name} ({user.id})")
+                if self._checkPriv(role, priv_level):
+                    self.log(f"Access granted to {user.display_name} ({user.id}) by role {role.name} ({role.id})", ratelimit="priv")
+                    return True
+
+        self.log(f"Access denied for {user.display_name} ({user.id})", ratelimit="priv")
         return False
         
     @admined
@@ -125,13 +284,17 @@ class PrivSystem(commands.Cog, AppModule):
     def setPriv(self, session, uid, user, priv_level : PrivSystemLevels):
         user.priv_level = priv_level.value
         session.commit()
+        self.invalidate(uid, user.is_role)
 
     def withPriv(level : PrivSystemLevels, send_error=True):
         def decorator(func):
             @wraps(func)
             async def wrapper(self, ctx: Union[commands.Context, discord.Interaction], *args, **kwargs):
                 priv_system = self.bot.get_cog('PrivSystem')
-                if priv_system.checkPriv(ctx.author, level):
+                with metrics.timed("priv"):
+                    allowed = priv_system.checkPriv(ctx.author, level)
+
+                if allowed:
                     return await func(self, ctx, *args, **kwargs)
                 elif (send_error):
                     await BaseBot.send_pretty(ctx, PrettyType.ERROR, title="Permission denied", message=f"This command can only be executed by users with {level.name} privileges or higher")
@@ -147,33 +310,22 @@ class PrivSystem(commands.Cog, AppModule):
     @priv.command()
     @withPriv(PrivSystemLevels.USER)
     async def all(self, ctx: commands.Context):
-        with self.db.session as session:
-            userlist = ""
-            users = session.query(BotUser).all()
-            
-            guild = ctx.guild
+        guild = ctx.guild
 
-            for user in users:
-                uid = int(user.uid)
-                level = PrivSystemLevels(user.priv_level).name
-                
-                if guild:
-                    if user.is_role:
-                        role = guild.get_role(uid)
-                        if role:
-                            userlist += f"[ROLE] {role.mention} ({level})\n"
-                    else:
-                        _user = guild.get_member(uid)
-                        if _user:
-                            userlist += f"[USER] {_user.mention} ({level})\n"
-                            
-                elif (ctx.author.id == uid):
-                    userlist += f"[DM USER] {ctx.author.mention} ({level})\n"
-                
-            if userlist == "":
-                userlist = "Empty"
-                    
-            await BaseBot.send_pretty(ctx, PrettyType.INFO, title="User & role list", message=userlist)
+        if not guild:
+            rows, _ = await self.getUsersPage([str(ctx.author.id)], 0, 1)
+            userlist = "\n".join(f"[DM USER] {ctx.author.mention} ({PrivSystemLevels(row.priv_level).name})" for row in rows if not row.is_role)
+            await BaseBot.send_pretty(ctx, PrettyType.INFO, title="User & role list", message=userlist or "Empty")
+            return
+
+        view = PrivListView(self, ctx, self.guildUids(guild))
+        embed = await view.render()
+
+        with metrics.timed("reply"):
+            if ctx.prefix == '/':
+                view.message = await ctx.send(embed=embed, view=view, ephemeral=True)
+            else:
+                view.message = await ctx.send(embed=embed, view=view)
         
     @priv.command()
     @withPriv(PrivSystemLevels.USER)
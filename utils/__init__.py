@@ -6,10 +6,25 @@ from .utils import to_task
 from .utils import fetch_url
 from .utils import get_file_extension
 from .utils import split_array
+from .utils import lazy_import
 
 from .exceptons import BotInternalException
 
 from .log import Log
 from .log import LogLevel
+from .log import logger
 
-from .cache import Cache
\ No newline at end of file
+from .cache import Cache
+from .cache import LRUCache
+
+from .executors import pools
+from .executors import PoolFull
+
+from .http import http
+from .http import HttpClient
+
+from .metrics import metrics
+from .metrics import current_command
+
+from .profiler import profiler
+from .watchdog import watchdog
\ No newline at end of file
@@ -1,4 +1,7 @@
 import json
+import time
+
+from collections import OrderedDict
 
 class Cache:
     def __init__(self, filename="cache.json"):
@@ -38,3 +41,57 @@ class Cache:
 
     def __contains__(self, key):
         return key in self._data
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry, entries may also expire after ttl seconds."""
+
+    def __init__(self, size=1024):
+        self._data      = OrderedDict()
+        self.size       = size
+        self.hits       = 0
+        self.misses     = 0
+
+    def _alive(self, key):
+        if key not in self._data:
+            return False
+
+        expires = self._data[key][1]
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return False
+
+        return True
+
+    def get(self, key, default=None):
+        if self._alive(key):
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+        self.misses += 1
+        return default
+
+    def put(self, key, value, ttl: float = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return entry[0] if entry else default
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self):
+        """Snapshot of the live entries, does not count as use."""
+        now = time.monotonic()
+        return [(key, value) for key, (value, expires) in self._data.items() if expires is None or expires > now]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._alive(key)
@@ -0,0 +1,148 @@
+import time
+import asyncio
+import threading
+import functools
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .log import Log
+from .metrics import metrics
+from .exceptons import BotInternalException
+
+class PoolFull(BotInternalException):
+    pass
+
+class Pool(Log):
+    """Bounded executor, work beyond size + queue_limit is rejected instead of piling up.
+
+    Process pools only take picklable module-level functions through submit/run, not the threaded/to_thread decorators.
+    """
+
+    def __init__(self, name: str, size: int = 4, queue_limit: int = 0, process: bool = False):
+        self.name           = name
+        self.size           = size
+        self.queue_limit    = queue_limit
+        self.process        = process
+
+        if process:
+            self.executor   = ProcessPoolExecutor(max_workers=size)
+        else:
+            self.executor   = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"pool-{name}")
+
+        self.pending        = 0
+        self.running        = 0
+        self.submitted      = 0
+        self.rejected       = 0
+        self.wait_total     = 0.0
+        self.wait_max       = 0.0
+
+        self._lock          = threading.Lock()
+
+    @property
+    def queued(self):
+        if self.process:
+            return max(self.pending - self.size, 0)
+
+        return self.pending - self.running
+
+    def _acquire(self):
+        with self._lock:
+            if self.queue_limit and self.pending >= self.size + self.queue_limit:
+                self.rejected += 1
+                raise PoolFull(f"Pool {self.name} is busy, try again later")
+
+            self.pending += 1
+            self.submitted += 1
+
+        metrics.set("bot_pool_queued", self.queued, pool=self.name)
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+        metrics.set("bot_pool_queued", self.queued, pool=self.name)
+
+    def _wrap(self, func, args, kwargs):
+        if self.process:
+            # Process pools need a picklable callable, wait time can't be measured inside the worker
+            return functools.partial(func, *args, **kwargs)
+
+        enqueued = time.perf_counter()
+        # Like asyncio.to_thread, so current_command and friends carry over into the worker
+        context = contextvars.copy_context()
+
+        def call():
+            wait = time.perf_counter() - enqueued
+            with self._lock:
+                self.running += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+            metrics.observe("bot_pool_wait_seconds", wait, pool=self.name)
+
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        return call
+
+    def submit(self, func, *args, **kwargs):
+        self._acquire()
+        future = self.executor.submit(self._wrap(func, args, kwargs))
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self):
+        queued = self.queued
+
+        with self._lock:
+            return {
+                "size":         self.size,
+                "kind":         "process" if self.process else "thread",
+                "running":      self.pending - queued,
+                "queued":       queued,
+                "submitted":    self.submitted,
+                "rejected":     self.rejected,
+                "wait_avg":     self.wait_total / self.submitted if self.submitted else 0.0,
+                "wait_max":     self.wait_max
+            }
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+class Pools(Log):
+    DEFAULTS = {
+        "default":  {"size": 8},
+        "db":       {"size": 8,  "queue_limit": 256},
+        "extract":  {"size": 4,  "queue_limit": 32},
+        "io":       {"size": 4,  "queue_limit": 128}
+    }
+
+    def __init__(self):
+        self.config     = {name: dict(options) for name, options in self.DEFAULTS.items()}
+        self.pools      = {}
+        self._lock      = threading.Lock()
+
+    def configure(self, config: dict):
+        """Must run before a pool is first used, existing pools keep their settings."""
+        for name, options in config.items():
+            self.config.setdefault(name, {}).update(options)
+
+    def get(self, name: str = "default") -> Pool:
+        with self._lock:
+            if name not in self.pools:
+                self.pools[name] = Pool(name, **self.config.get(name, self.config["default"]))
+
+            return self.pools[name]
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+pools = Pools()
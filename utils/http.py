@@ -0,0 +1,73 @@
+import aiohttp
+
+from .log import Log
+from .cache import LRUCache
+
+class HttpClient(Log):
+    """One pooled aiohttp session for the whole process, with an optional ETag/Last-Modified response cache."""
+
+    def __init__(self):
+        self.limit          = 100
+        self.limit_per_host = 10
+        self.dns_ttl        = 300
+        self.timeout        = 30
+
+        self.cache          = LRUCache(256)
+        self._session       = None
+
+    def configure(self, limit: int = 100, limit_per_host: int = 10, dns_ttl: int = 300, timeout: int = 30, cache_size: int = 256):
+        self.limit          = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl        = dns_ttl
+        self.timeout        = timeout
+        self.cache.size     = cache_size
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily, a session has to be created inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, ttl_dns_cache=self.dns_ttl)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        return self._session
+
+    async def _get(self, url: str, read, cache: bool = False, **kwargs):
+        cached = self.cache.get(url) if cache else None
+        headers = dict(kwargs.pop("headers", None) or {})
+
+        if cached:
+            etag, last_modified, body = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        async with self.session.get(url, headers=headers, **kwargs) as response:
+            if cached and response.status == 304:
+                return cached[2]
+
+            response.raise_for_status()
+            body = await read(response)
+
+            if cache and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+                self.cache.put(url, (response.headers.get("ETag"), response.headers.get("Last-Modified"), body))
+
+            return body
+
+    async def get_text(self, url: str, cache: bool = False, **kwargs) -> str:
+        return await self._get(url, lambda response: response.text(), cache, **kwargs)
+
+    async def get_bytes(self, url: str, cache: bool = False, **kwargs) -> bytes:
+        return await self._get(url, lambda response: response.read(), cache, **kwargs)
+
+    async def get_json(self, url: str, cache: bool = False, **kwargs):
+        return await self._get(url, lambda response: response.json(), cache, **kwargs)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+            self.log("HTTP session closed")
+
+        self._session = None
+
+http = HttpClient()
@@ -1,18 +1,180 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
 import datetime as dt
 
-from enum import Enum, auto
+from enum import Enum
 
 class LogLevel(Enum):
-    INFO        = auto()
-    WARN        = auto()
-    ERR         = auto()
-    FATAL       = auto()
+    DEBUG       = 0
+    INFO        = 1
+    WARN        = 2
+    ERR         = 3
+    FATAL       = 4
 
+class Logger:
+    """Formats and writes log records on a background thread so callers never block on I/O."""
 
-class Log:
+    def __init__(self):
+        self.level          = LogLevel.INFO
+        self.json           = False
+        self.stream         = sys.stdout
+        self.file           = None
+        self.max_bytes      = 0
+        self.backups        = 0
+        self.rate           = 20
+
+        self.dropped        = 0
+        self._file          = None
+        self._buckets       = {}
+        self._queue         = queue.Queue(maxsize=10000)
+        self._thread        = None
+        self._lock          = threading.Lock()
+
+    def configure(self, level: str = "INFO", json: bool = False, file: str = None, max_bytes: int = 10 * 1024 * 1024, backups: int = 5, rate: int = 20, stdout: bool = True):
+        self.level          = LogLevel[level]
+        self.json           = json
+        self.stream         = sys.stdout if stdout else None
+        self.max_bytes      = max_bytes
+        self.backups        = backups
+        self.rate           = rate
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+        self.file = file
+        if file:
+            self._file = open(file, 'a', encoding="utf-8")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _allow(self, key: str, now: float):
+        # Fixed one second window per key, suppressed lines are reported when the window rolls over
+        with self._lock:
+            window, count, suppressed = self._buckets.get(key, (now, 0, 0))
+
+            if now - window >= 1.0:
+                if suppressed:
+                    self._queue.put_nowait((now, "Logger", LogLevel.WARN, f"Suppressed {suppressed} '{key}' messages"))
+                window, count, suppressed = now, 0, 0
+
+            if count >= self.rate:
+                self._buckets[key] = (window, count, suppressed + 1)
+                return False
+
+            self._buckets[key] = (window, count + 1, suppressed)
+            return True
+
+    def submit(self, name: str, message, level: LogLevel, ratelimit: str = None):
+        if level.value < self.level.value:
+            return
+
+        now = time.time()
+
+        try:
+            if ratelimit and not self._allow(ratelimit, now):
+                return
+
+            self._queue.put_nowait((now, name, level, message))
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if self._thread is None:
+            self._start()
+
+    def _format(self, record):
+        now, name, level, message = record
+
+        # Callables are evaluated lazily so hot paths can defer formatting
+        if callable(message):
+            message = message()
+
+        if self.json:
+            return json.dumps({
+                "time":     now,
+                "module":   name,
+                "level":    level.name,
+                "message":  str(message)
+            }, ensure_ascii=False)
 
-    def log(self, message, level: LogLevel = LogLevel.INFO):
-        now = dt.datetime.now()
-        now_string = now.strftime("%d-%m-%Y %H:%M:%S")
+        now_string = dt.datetime.fromtimestamp(now).strftime("%d-%m-%Y %H:%M:%S")
+        return f"[{now_string}][{name:>20s}][{level.name}]: {message}"
+
+    def _rotate(self):
+        self._file.close()
+
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.file}.{i + 1}")
+
+        if self.backups > 0:
+            os.replace(self.file, f"{self.file}.1")
+        else:
+            os.remove(self.file)
+
+        self._file = open(self.file, 'a', encoding="utf-8")
+
+    def _write(self, line: str):
+        if self.stream:
+            self.stream.write(line + "\n")
+
+        if self._file:
+            self._file.write(line + "\n")
+
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _worker(self):
+        while True:
+            record = self._queue.get()
+
+            try:
+                if record is None:
+                    return
+
+                try:
+                    self._write(self._format(record))
+                except Exception as e:
+                    sys.stderr.write(f"Logger failed to write record: {e}\n")
+
+                # Flush once the backlog is drained instead of on every line
+                if self._queue.empty():
+                    if self.stream:
+                        self.stream.flush()
+                    if self._file:
+                        self._file.flush()
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+logger = Logger()
+atexit.register(logger.shutdown)
+
+class Log:
 
-        print(f"[{now_string}][{self.__class__.__name__:>20s}][{level.name}]: {message}")
\ No newline at end of file
+    def log(self, message, level: LogLevel = LogLevel.INFO, ratelimit: str = None):
+        logger.submit(self.__class__.__name__, message, level, ratelimit)
@@ -0,0 +1,163 @@
+import time
+import threading
+import contextvars
+
+from contextlib import contextmanager
+
+from aiohttp import web
+
+from .log import Log
+
+current_command = contextvars.ContextVar("current_command", default="none")
+
+class Histogram:
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets    = buckets
+        self.counts     = [0] * len(buckets)
+        self.count      = 0
+        self.sum        = 0.0
+        self.max        = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+        self.count  += 1
+        self.sum    += value
+        self.max    = max(self.max, value)
+
+    def quantile(self, q: float):
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+        return self.max
+
+class Metrics(Log):
+    def __init__(self):
+        self._lock          = threading.Lock()
+        self.histograms     = {}
+        self.counters       = {}
+        self.gauges         = {}
+        self._runner        = None
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def inc(self, name: str, value: int = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("bot_stage_seconds", time.perf_counter() - start, command=current_command.get(), stage=stage)
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+
+        return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+    def render(self) -> str:
+        lines = []
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{self._labels(labels)} {value}")
+
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f"{name}{self._labels(labels)} {value}")
+
+            for (name, labels), hist in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{name}_sum{self._labels(labels)} {hist.sum}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str = "bot_stage_seconds"):
+        result = {}
+
+        with self._lock:
+            for (_name, labels), hist in self.histograms.items():
+                if _name != name:
+                    continue
+
+                labels = dict(labels)
+                result[(labels.get("command"), labels.get("stage"))] = {
+                    "count":    hist.count,
+                    "sum":      hist.sum,
+                    "avg":      hist.sum / hist.count if hist.count else 0.0,
+                    "p50":      hist.quantile(0.5),
+                    "p99":      hist.quantile(0.99),
+                    "max":      hist.max
+                }
+
+        return result
+
+    def errors(self):
+        """Command errors summed per error type over all commands."""
+        result = {}
+
+        with self._lock:
+            for (name, labels), value in self.counters.items():
+                if name == "bot_command_errors_total":
+                    error = dict(labels).get("error")
+                    result[error] = result.get(error, 0) + value
+
+        return result
+
+    async def _handle(self, request):
+        return web.Response(text=self.render(), content_type="text/plain")
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 9100):
+        if self._runner:
+            return
+
+        server = web.Application()
+        server.router.add_get("/metrics", self._handle)
+
+        self._runner = web.AppRunner(server)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.log(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async def stop_server(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+metrics = Metrics()
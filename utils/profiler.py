@@ -0,0 +1,165 @@
+import io
+import os
+import sys
+import time
+import pstats
+import asyncio
+import logging
+import cProfile
+import threading
+import tracemalloc
+import traceback
+
+from collections import Counter
+
+from .log import Log
+from .exceptons import BotInternalException
+
+class _SlowCallbackHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.records = []
+
+    def emit(self, record):
+        message = record.getMessage()
+        if "took" in message:
+            self.records.append(message)
+
+class Profiler(Log):
+    """Runs one on-demand profiling session at a time against the running event loop."""
+
+    MODES = ("cprofile", "stack", "memory", "slow")
+
+    def __init__(self, directory="profiles"):
+        self.directory      = directory
+        self.mode           = None
+        self.started        = None
+
+        self._loop          = None
+        self._profile       = None
+        self._samples       = None
+        self._sampler       = None
+        self._stop_event    = None
+        self._snapshot      = None
+        self._handler       = None
+        self._slow_duration = None
+
+    @property
+    def running(self):
+        return self.mode is not None
+
+    def start(self, mode: str, interval: float = 0.005, threshold: float = 0.1):
+        if self.running:
+            raise BotInternalException(f"Profiler already running ({self.mode})")
+
+        if mode not in self.MODES:
+            raise BotInternalException(f"Unknown profiler mode {mode}, expected one of {', '.join(self.MODES)}")
+
+        self._loop = asyncio.get_running_loop()
+
+        if mode == "cprofile":
+            # Must be called from the loop thread, cProfile only hooks the calling thread
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif mode == "stack":
+            self._samples = Counter()
+            self._stop_event = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), interval), name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        elif mode == "memory":
+            tracemalloc.start(25)
+            self._snapshot = tracemalloc.take_snapshot()
+        elif mode == "slow":
+            self._handler = _SlowCallbackHandler()
+            logging.getLogger("asyncio").addHandler(self._handler)
+            self._slow_duration = self._loop.slow_callback_duration
+            self._loop.slow_callback_duration = threshold
+            self._loop.set_debug(True)
+
+        self.mode = mode
+        self.started = time.monotonic()
+        self.log(f"Profiler started ({mode})")
+
+    def _sample(self, thread_id: int, interval: float):
+        while not self._stop_event.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+
+            stack = traceback.extract_stack(frame)
+            self._samples[";".join(f"{f.name} ({os.path.basename(f.filename)}:{f.lineno})" for f in stack)] += 1
+
+    def _path(self, suffix: str):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{self.mode}-{time.strftime('%Y%m%d-%H%M%S')}.{suffix}")
+
+    def stop(self, top: int = 20):
+        """Stops the session and returns (report, path) where path is a file with the full result."""
+        if not self.running:
+            raise BotInternalException("Profiler is not running")
+
+        elapsed = time.monotonic() - self.started
+        lines = [f"{self.mode} profile over {elapsed:.1f}s"]
+        path = None
+
+        if self.mode == "cprofile":
+            self._profile.disable()
+            path = self._path("prof")
+            self._profile.dump_stats(path)
+
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(top)
+            lines.append(out.getvalue())
+            self._profile = None
+        elif self.mode == "stack":
+            self._stop_event.set()
+            self._sampler.join()
+            total = sum(self._samples.values()) or 1
+
+            # Folded stacks are the input format of flamegraph.pl and speedscope
+            path = self._path("folded")
+            with open(path, 'w') as file:
+                for stack, count in self._samples.items():
+                    file.write(f"{stack} {count}\n")
+
+            leaves = Counter()
+            for stack, count in self._samples.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+
+            for leaf, count in leaves.most_common(top):
+                lines.append(f"{count / total * 100:5.1f}% {leaf}")
+            self._samples = None
+        elif self.mode == "memory":
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+            path = self._path("txt")
+            stats = snapshot.compare_to(self._snapshot, "lineno")
+            with open(path, 'w') as file:
+                for stat in stats:
+                    file.write(f"{stat}\n")
+
+            for stat in stats[:top]:
+                lines.append(str(stat))
+            self._snapshot = None
+        elif self.mode == "slow":
+            self._loop.set_debug(False)
+            self._loop.slow_callback_duration = self._slow_duration
+            logging.getLogger("asyncio").removeHandler(self._handler)
+
+            records = self._handler.records
+            path = self._path("txt")
+            with open(path, 'w') as file:
+                file.write("\n".join(records))
+
+            lines.append(f"{len(records)} slow callbacks")
+            lines.extend(records[:top])
+            self._handler = None
+
+        self.log(f"Profiler stopped ({self.mode}), result saved to {path}")
+        self.mode = None
+        self.started = None
+
+        return "\n".join(lines), path
+
+profiler = Profiler()
@@ -1,10 +1,13 @@
-import threading
 import asyncio
 import typing
-import aiohttp
+import importlib
+import threading
 from discord.ext import commands
 from functools import wraps
 from db import Database
+from .http import http
+from .executors import pools
+from .exceptons import BotInternalException
 
 def mutexed(func):
     def wrapper(self, *args, **kwargs):
@@ -18,28 +21,48 @@ def semaphored(func):
             return func(self, *args, **kwargs)
     return wrapper
 
-def threaded(func):
-    def wrapper(*args, **kwargs):
-        t = threading.Thread(target=func, args=args, kwargs=kwargs)
-        t.start()
-        return t
-    return wrapper
+def _thread_pool(name: str):
+    pool = pools.get(name)
 
-def to_thread(func: typing.Callable) -> typing.Coroutine:
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        return await asyncio.to_thread(func, *args, **kwargs)
-    return wrapper
+    # The decorated name points at the wrapper, so the original function can't be pickled by reference
+    if pool.process:
+        raise BotInternalException(f"Pool {name} is a process pool, use pools.get(\"{name}\").run with a module-level function instead")
+
+    return pool
+
+def threaded(func=None, pool: str = "default"):
+    """Runs func on a named thread pool without waiting, returns the concurrent Future. Usable as @threaded or @threaded("io")."""
+    if isinstance(func, str):
+        func, pool = None, func
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return _thread_pool(pool).submit(func, *args, **kwargs)
+        return wrapper
+
+    return decorator(func) if func else decorator
+
+def to_thread(func=None, pool: str = "default") -> typing.Callable:
+    """Makes func awaitable by running it on a named thread pool. Usable as @to_thread or @to_thread("db")."""
+    if isinstance(func, str):
+        func, pool = None, func
+
+    def decorator(func: typing.Callable) -> typing.Coroutine:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await _thread_pool(pool).run(func, *args, **kwargs)
+        return wrapper
+
+    return decorator(func) if func else decorator
 
 def to_task(func):
     def wrapper(*args, **kwargs):
         return asyncio.create_task(func(*args, **kwargs))
     return wrapper
 
-async def fetch_url(url):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                return await response.text()
+async def fetch_url(url, cache=False):
+    return await http.get_text(url, cache=cache)
 
 def get_file_extension(filename):
     parts = filename.split(".")
@@ -49,4 +72,23 @@ def get_file_extension(filename):
         return None
     
 def split_array(array, chunk_size):
-    return [array[i:i+chunk_size] for i in range(0, len(array), chunk_size)]
\ No newline at end of file
+    return [array[i:i+chunk_size] for i in range(0, len(array), chunk_size)]
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name      = name
+        self._module    = None
+        self._lock      = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+
+        return getattr(self._module, attr)
+
+def lazy_import(name):
+    return LazyModule(name)
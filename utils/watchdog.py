@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+
+from .log import Log, LogLevel
+from .metrics import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class LoopWatchdog(Log):
+    """Pings the event loop from a side thread and reports whatever is blocking it when a ping is late."""
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.5):
+        self.threshold      = threshold
+        self.interval       = interval
+
+        # culprit -> [count, total seconds, worst seconds]
+        self.stalls         = {}
+
+        self._loop          = None
+        self._loop_thread   = None
+        self._thread        = None
+        self._stop          = threading.Event()
+        self._lock          = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if self.running:
+            return
+
+        self._loop = loop or asyncio.get_running_loop()
+        # Must be called from the loop thread so the right stack gets sampled
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        self.log(f"Watching event loop, threshold {self.threshold * 1000:.0f}ms")
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _culprit(stack):
+        # Innermost frame of our own code is the useful answer, library frames below it are just where it ended up
+        for frame in reversed(stack):
+            path = os.path.abspath(frame.filename)
+            if path.startswith(ROOT) and "site-packages" not in path and not path.endswith("watchdog.py"):
+                return f"{frame.name} ({os.path.relpath(path, ROOT)}:{frame.lineno})"
+
+        frame = stack[-1]
+        return f"{frame.name} ({os.path.basename(frame.filename)}:{frame.lineno})"
+
+    def _record(self, culprit: str, lag: float, stack):
+        with self._lock:
+            entry = self.stalls.setdefault(culprit, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += lag
+            entry[2] = max(entry[2], lag)
+
+        metrics.inc("bot_loop_stalls_total", function=culprit)
+        self.log(f"Event loop blocked for {lag * 1000:.0f}ms by {culprit}\n{''.join(traceback.format_list(stack))}", LogLevel.WARN)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            beat = threading.Event()
+            sent = time.monotonic()
+
+            try:
+                self._loop.call_soon_threadsafe(beat.set)
+            except RuntimeError:
+                # Loop closed
+                return
+
+            if beat.wait(self.threshold):
+                metrics.observe("bot_loop_lag_seconds", time.monotonic() - sent)
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = traceback.extract_stack(frame) if frame else []
+
+            while not beat.wait(1.0):
+                if self._stop.is_set():
+                    return
+
+            lag = time.monotonic() - sent
+            metrics.observe("bot_loop_lag_seconds", lag)
+
+            if stack:
+                self._record(self._culprit(stack), lag, stack)
+
+    def ranking(self, top: int = 10):
+        with self._lock:
+            return sorted(self.stalls.items(), key=lambda item: item[1][1], reverse=True)[:top]
+
+watchdog = LoopWatchdog()